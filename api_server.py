@@ -0,0 +1,298 @@
+"""Read-only JSON API over the tournament database.
+
+Serves the standings, fixtures, knockout matches and winner to scoreboards,
+bots and stream overlays without running the Streamlit script:
+
+    python api_server.py --port 8600
+
+Every response is built once per data version and kept in memory, so a
+request costs one version check and a copy of bytes already encoded. The
+ETag is the data version: clients sending it back in ``If-None-Match`` get
+``304 Not Modified`` until a score changes.
+
+``/standings?after=N`` and ``/standings?at=<ISO 8601 time>`` return the
+table as it stood after the first N completed matches or at that time (see
+league_history.py).
+
+``/events`` pushes the same data as Server-Sent Events: a snapshot on
+connect, then a compact delta after every committed change (see
+score_feed.py).
+"""
+import argparse
+import json
+import sqlite3
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import tournament_db
+from league_history import LeagueHistory
+from score_feed import HEARTBEAT_INTERVAL, ScoreFeed, encode_event
+from tournament_db import (get_data_version, load_knockout_matches, load_match_history, load_matches, load_teams,
+                           read_data_version, read_snapshot)
+
+_lock = threading.Lock()
+# (data version, {table: rows}, {path: encoded JSON body}) of the last read
+_state = (None, {}, {})
+# (data version, LeagueHistory), built the first time a past table is asked for
+_history = (None, None)
+
+
+def read_tables(conn):
+    """Return ``(data version, {table: rows})`` read from one snapshot."""
+    data_version = read_data_version(conn)
+    teams = load_teams(conn)
+    matches = load_matches(conn)
+    knockout = load_knockout_matches(conn)
+
+    for df in (matches, knockout):
+        df['completed'] = df['completed'].astype(bool)
+        # Unplayed scores are NULL, which pandas would otherwise turn into floats
+        df[['score1', 'score2']] = df[['score1', 'score2']].astype('Int64')
+
+    return data_version, {
+        'standings': _rows(teams),
+        'fixtures': _rows(matches),
+        'knockout': _rows(knockout),
+        'winner': tournament_winner(knockout),
+    }
+
+
+def build_documents(data_version, tables):
+    """Encode each endpoint's response body once."""
+    documents = {
+        f'/{table}': json.dumps({'count': len(rows), 'rows': rows} if table != 'winner' else rows)
+        for table, rows in tables.items()
+    }
+    documents['/'] = json.dumps({
+        'data_version': data_version,
+        'endpoints': sorted(documents) + ['/events'],
+    })
+    return {path: body.encode() for path, body in documents.items()}
+
+
+def tournament_winner(knockout):
+    """The champion once the final has been played, as the bracket shows it."""
+    final = knockout[knockout['stage'] == 'final']
+    if final.empty or not final.iloc[0]['completed']:
+        return {'winner': None}
+    final = final.iloc[0]
+    team1_won = final['score1'] > final['score2']
+    return {
+        'winner': final['team1'] if team1_won else final['team2'],
+        'runner_up': final['team2'] if team1_won else final['team1'],
+        'score': [int(final['score1']), int(final['score2'])],
+    }
+
+
+def _rows(df):
+    # Round-tripped through pandas' JSON writer, which turns numpy integers,
+    # missing values and timestamps into plain JSON types
+    return json.loads(df.to_json(orient='records', date_format='iso'))
+
+
+def current_state():
+    """Return ``(data version, tables, documents)``, rebuilt after a write."""
+    global _state
+    data_version = get_data_version()
+    if data_version == _state[0]:
+        return _state
+
+    with _lock:
+        # Another request may have rebuilt them while this one waited
+        if data_version != _state[0]:
+            with read_snapshot() as conn:
+                data_version, tables = read_tables(conn)
+            _state = (data_version, tables, build_documents(data_version, tables))
+        return _state
+
+
+def league_history():
+    """The LeagueHistory of the current data version."""
+    global _history
+    data_version = get_data_version()
+    if data_version == _history[0]:
+        return _history
+
+    with _lock:
+        if data_version != _history[0]:
+            with read_snapshot() as conn:
+                _history = (read_data_version(conn), LeagueHistory(load_match_history(conn), load_teams(conn)))
+        return _history
+
+
+def past_standings(query):
+    """Return ``(data version, body)`` for a ``/standings`` query asking for a past table.
+
+    Raises ValueError for a query that is not ``after=<count>`` or ``at=<time>``.
+    """
+    params = parse_qs(query)
+    data_version, history = league_history()
+    if 'after' in params:
+        after = params['after'][0]
+        if not after.isdigit():
+            raise ValueError("after must be a number of matches")
+        after = min(int(after), len(history))
+    elif 'at' in params:
+        after = history.matches_by(params['at'][0])
+    else:
+        raise ValueError("expected after=<matches> or at=<ISO 8601 time>")
+
+    rows = _rows(history.table_after(after))
+    last = history.matches.iloc[after - 1] if after else None
+    return data_version, json.dumps({
+        'after_match': after,
+        'last_match': None if last is None else {'id': int(last['id']), 'match_name': last['match_name'], 'end_time': last['end_time']},
+        'count': len(rows),
+        'rows': rows,
+    }).encode()
+
+
+feed = ScoreFeed(current_state)
+
+
+class TournamentAPIHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so pollers reuse one connection; without TCP_NODELAY every
+    # keep-alive response would wait out the client's delayed ACK
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    server_version = 'TournamentAPI/1.0'
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] == '/events':
+            self._stream_events()
+            return
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def _respond(self, send_body):
+        path, _, query = self.path.partition('?')
+        path = path.rstrip('/') or '/'
+        try:
+            data_version, _, documents = current_state()
+            body = documents.get(path)
+            if path == '/standings' and query:
+                data_version, body = past_standings(query)
+        except sqlite3.Error as e:
+            self._send_json(503, {'error': f"database unavailable: {e}"}, send_body)
+            return
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)}, send_body)
+            return
+
+        if body is None:
+            self._send_json(404, {'error': 'not found', 'endpoints': sorted(documents)}, send_body)
+            return
+
+        etag = f'"{data_version}"'
+        if etag_matches(self.headers.get('If-None-Match'), etag):
+            self.send_response(304)
+            self._send_cache_headers(etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self._send_cache_headers(etag)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _stream_events(self):
+        try:
+            data_version, tables, _ = current_state()
+        except sqlite3.Error as e:
+            self._send_json(503, {'error': f"database unavailable: {e}"}, True)
+            return
+        feed.start()
+
+        # The stream has no length, so it ends the connection
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+
+        try:
+            # A reconnecting EventSource resumes from the last event it saw
+            last_seen = self.headers.get('Last-Event-ID', '')
+            if not last_seen.isdigit() or feed.missed_events(int(last_seen)) is None:
+                self.wfile.write(b'retry: 2000\n' + encode_event('snapshot', data_version, {'data_version': data_version, **tables}))
+                last_seen = data_version
+            else:
+                last_seen = int(last_seen)
+
+            while True:
+                missed = feed.wait_for_events(last_seen, HEARTBEAT_INTERVAL)
+                if missed is None:
+                    # Too far behind for the deltas still kept, start over
+                    data_version, tables, _ = current_state()
+                    self.wfile.write(encode_event('snapshot', data_version, {'data_version': data_version, **tables}))
+                    last_seen = data_version
+                    continue
+                last_seen, events = missed
+                # An empty write is a comment line, which lets both ends
+                # notice a dead connection
+                self.wfile.write(events or b': keep-alive\n\n')
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        except sqlite3.Error as e:
+            self.log_error("event stream stopped: %s", e)
+
+    def _send_cache_headers(self, etag):
+        self.send_header('ETag', etag)
+        # Cacheable, but to be revalidated on every use
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Expose-Headers', 'ETag')
+
+    def _send_json(self, status, payload, send_body):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def log_request(self, code='-', size='-'):
+        # Only errors are logged; a line per poll would cost more than the poll
+        if isinstance(code, int) and code >= 400:
+            super().log_request(code, size)
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    # Weak validators compare equal to strong ones for If-None-Match
+    return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--db', default=tournament_db.DB_PATH, help="path of tournament.db")
+    args = parser.parse_args()
+
+    tournament_db.DB_PATH = args.db
+    server = ThreadingHTTPServer((args.host, args.port), TournamentAPIHandler)
+    server.daemon_threads = True
+    print(f"Serving {args.db} on http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""Process-wide cache of the images shown in the app's HTML.
+
+Every image is read from disk, downscaled to the slot it is displayed in and
+encoded once per server process; reruns after that only stat the file.
+Variants are keyed on the file's content hash, which is recomputed only when
+the file's mtime or size changes, so replacing an asset still shows up.
+
+When Streamlit's static file serving is on (``server.enableStaticServing``
+in ``.streamlit/config.toml``) variants are written to ``static/`` under a
+content-hashed name and referenced by URL, so browsers download each image
+once instead of receiving it inline with every rerun. Otherwise they are
+inlined as ``data:`` URIs.
+"""
+import base64
+import hashlib
+import io
+import os
+import threading
+
+import streamlit as st
+from PIL import Image
+
+# Streamlit serves this folder, next to the main script, at app/static/
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+STATIC_URL = 'app/static'
+
+# Variants are rendered at twice their CSS size to stay sharp on high-DPI screens
+PIXEL_DENSITY = 2
+JPEG_QUALITY = 85
+EXTENSIONS = {'image/jpeg': '.jpg', 'image/png': '.png', 'image/gif': '.gif', 'image/webp': '.webp'}
+
+_lock = threading.Lock()
+_hashes = {}    # path -> (mtime_ns, size, content hash)
+_variants = {}  # (content hash, max_width, max_height, cover) -> {'data', 'mime', 'uri', 'url'}
+
+
+def static_serving_enabled():
+    return bool(st.get_option('server.enableStaticServing'))
+
+
+def image_src(path, max_width=None, max_height=None, cover=False):
+    """Return what to put in an ``<img src>`` for ``path``.
+
+    A static file URL when static serving is on, a data URI otherwise; see
+    image_data_uri for the sizing arguments.
+    """
+    if static_serving_enabled():
+        return image_url(path, max_width, max_height, cover)
+    return image_data_uri(path, max_width, max_height, cover)
+
+
+def image_data_uri(path, max_width=None, max_height=None, cover=False):
+    """Return the image at ``path`` as a ``data:`` URI.
+
+    ``max_width`` and ``max_height`` are the CSS pixel size of the slot the
+    image is shown in; larger images are scaled down to fit inside it, or
+    with ``cover`` (for ``object-fit: cover`` slots) just enough to fill it.
+    The file is sent as is when that would not make it smaller.
+    """
+    variant = _variant(path, max_width, max_height, cover)
+    if 'uri' not in variant:
+        variant['uri'] = f"data:{variant['mime']};base64,{base64.b64encode(variant['data']).decode()}"
+    return variant['uri']
+
+
+def image_url(path, max_width=None, max_height=None, cover=False):
+    """Write the scaled image to ``static/`` and return its URL.
+
+    File names carry a hash of their bytes, so a URL never changes content
+    and browsers can keep it cached for good.
+    """
+    variant = _variant(path, max_width, max_height, cover)
+    if 'url' not in variant:
+        stem = os.path.splitext(os.path.basename(path))[0].replace(' ', '_')
+        digest = hashlib.sha256(variant['data']).hexdigest()[:12]
+        name = f"{stem}-{digest}{EXTENSIONS.get(variant['mime'], '.img')}"
+        target = os.path.join(STATIC_DIR, name)
+        if not os.path.exists(target):
+            os.makedirs(STATIC_DIR, exist_ok=True)
+            # Write under a temporary name so a request never sees half a file
+            partial = f"{target}.{threading.get_ident()}.tmp"
+            with open(partial, 'wb') as f:
+                f.write(variant['data'])
+            os.replace(partial, target)
+        variant['url'] = f"{STATIC_URL}/{name}"
+    return variant['url']
+
+
+def _variant(path, max_width, max_height, cover):
+    data, content_hash = _read(path)
+    key = (content_hash, max_width, max_height, cover)
+    with _lock:
+        variant = _variants.get(key)
+    if variant is None:
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+        variant = _scale(data, max_width, max_height, cover)
+        with _lock:
+            variant = _variants.setdefault(key, variant)
+    return variant
+
+
+def _read(path):
+    """Return ``(data, content_hash)``; data is None when the file is unchanged."""
+    stat = os.stat(path)
+    with _lock:
+        known = _hashes.get(path)
+    if known is not None and known[:2] == (stat.st_mtime_ns, stat.st_size):
+        return None, known[2]
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    content_hash = hashlib.sha256(data).hexdigest()
+    with _lock:
+        _hashes[path] = (stat.st_mtime_ns, stat.st_size, content_hash)
+        if known is not None and known[2] != content_hash:
+            # The file was replaced; its old variants can never be asked for again
+            for key in [key for key in _variants if key[0] == known[2]]:
+                del _variants[key]
+    return data, content_hash
+
+
+def _scale(data, max_width, max_height, cover):
+    image = Image.open(io.BytesIO(data))
+    mime = Image.MIME.get(image.format, 'image/png')
+
+    ratios = []
+    if max_width:
+        ratios.append(max_width * PIXEL_DENSITY / image.width)
+    if max_height:
+        ratios.append(max_height * PIXEL_DENSITY / image.height)
+    scale = (max(ratios) if cover else min(ratios)) if ratios else 1
+
+    if scale < 1:
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        if image.mode == 'P':
+            # Palette images can only be resized without smoothing
+            image = image.convert('RGBA')
+        image = image.resize(size, Image.LANCZOS)
+        out = io.BytesIO()
+        if image.mode in ('RGBA', 'LA', 'P') or 'transparency' in image.info:
+            image.save(out, format='PNG', optimize=True)
+            scaled_mime = 'image/png'
+        else:
+            image.convert('RGB').save(out, format='JPEG', quality=JPEG_QUALITY, optimize=True)
+            scaled_mime = 'image/jpeg'
+        if out.tell() < len(data):
+            data, mime = out.getvalue(), scaled_mime
+
+    return {'data': data, 'mime': mime}
@@ -0,0 +1,219 @@
+"""Checks that the standings stay consistent through the writes that change them.
+
+    python consistency_check.py
+
+runs every check against a scratch database in a temporary directory (the
+tournament's own database is never opened), prints what each found and
+exits 1 if any failed:
+
+- hot_reads_use_indexes: each of tournament_db.HOT_READS is answered from
+  an index in its own order, on the schema init_database creates
+- fixture_update_ranks_teams: a fixture update that adds one team and drops
+  another, without changing any result, leaves every team ranked 1..N
+- concurrent_saves_stay_consistent: SCORERS threads each make SAVES_PER_SCORER
+  compare-and-swap saves on the same few matches, reading the version before
+  every save like the admin forms do. Each match's version must end up its
+  start value plus the saves that went through, its latest ledger result
+  must be its stored score, and the standings, head-to-head results and
+  positions kept incrementally must equal a rebuild from the whole ledger
+- import_leaves_writer_free: a score save made while a fixture import is
+  part-way through its file goes through without waiting for the import,
+  and an import whose file fails part-way leaves the tournament and the
+  staging table as they were
+"""
+import itertools
+import os
+import random
+import sys
+import tempfile
+import threading
+from collections import Counter
+
+import pandas as pd
+
+from ledger import STAT_COLUMNS, rebuild_standings
+from fixture_import import STAGING_TABLE
+from tournament_db import load_teams, read_connection, run_write, unindexed_reads
+
+TEAMS = ['Alpha FC', 'Bravo FC', 'Charlie FC', 'Delta FC', 'Echo FC', 'Foxtrot FC']
+
+# Scorers saving at once, the saves each makes, and the matches they all edit
+SCORERS = 20
+SAVES_PER_SCORER = 30
+HOT_MATCHES = 4
+# Longest a score save may take while an import is reading its file
+SAVE_TIMEOUT = 5
+
+
+def round_robin(teams):
+    """A fixture sheet of every pairing of ``teams``, the first half already played."""
+    pairs = list(itertools.combinations(teams, 2))
+    played = len(pairs) // 2
+    return pd.DataFrame({
+        'Match': [f"Match {n}" for n in range(1, len(pairs) + 1)],
+        'Team 1': [team1 for team1, _ in pairs],
+        'Team 2': [team2 for _, team2 in pairs],
+        'Score1': [n % 4 if n < played else None for n in range(len(pairs))],
+        'Score2': [n % 3 if n < played else None for n in range(len(pairs))],
+    })
+
+
+def ranked_in_order(teams):
+    # The standings read lists every team once, at positions 1..N
+    return teams['position'].tolist() == list(range(1, len(teams) + 1))
+
+
+def hot_reads_use_indexes(app):
+    with read_connection() as conn:
+        slow = unindexed_reads(conn)
+    return [f"{name} scans and sorts: {' / '.join(plan)}" for name, plan in slow.items()]
+
+
+def fixture_update_ranks_teams(app):
+    fixtures = round_robin(TEAMS)
+    app.import_fixtures(fixtures)
+
+    # Swap the last unplayed match for one against a new team: Foxtrot FC
+    # plays no match any more, and no result changes
+    update = fixtures.iloc[:-1].copy()
+    update.loc[len(fixtures)] = ["Match 99", "Newcomers FC", "Alpha FC", None, None]
+    update = update[update['Team 1'].ne('Foxtrot FC') & update['Team 2'].ne('Foxtrot FC')]
+    app.apply_fixture_update(update)
+
+    teams = app.get_teams()
+    failures = []
+    if 'Newcomers FC' not in set(teams['name']) or 'Foxtrot FC' in set(teams['name']):
+        failures.append(f"teams after the update: {sorted(teams['name'])}")
+    if not ranked_in_order(teams):
+        failures.append(f"positions {teams['position'].tolist()} for {teams['name'].tolist()}")
+    return failures
+
+
+def concurrent_saves_stay_consistent(app):
+    app.import_fixtures(round_robin(TEAMS))
+    matches = app.get_matches()
+    start_versions = dict(zip(matches['id'].astype(int), matches['version'].astype(int)))
+    hot = list(start_versions)[:HOT_MATCHES]
+    saved, conflicts = Counter(), Counter()
+    lock = threading.Lock()
+
+    def scorer(seed):
+        rng = random.Random(seed)
+        for _ in range(SAVES_PER_SCORER):
+            match_id = rng.choice(hot)
+            with read_connection() as conn:
+                version = conn.execute("SELECT version FROM matches WHERE id = ?", (match_id,)).fetchone()[0]
+            status, _ = app.update_match_score(match_id, rng.randrange(5), rng.randrange(5), version)
+            with lock:
+                (saved if status == 'updated' else conflicts)[match_id] += 1
+
+    scorers = [threading.Thread(target=scorer, args=(seed,)) for seed in range(SCORERS)]
+    for thread in scorers:
+        thread.start()
+    for thread in scorers:
+        thread.join()
+
+    failures = []
+    if not conflicts:
+        failures.append("no save conflicted, so the scorers never raced")
+    stored = app.get_matches().set_index('id')
+    with read_connection() as conn:
+        latest = {match_id: (score1, score2) for match_id, score1, score2 in conn.execute(
+            "SELECT match_id, score1, score2 FROM match_events ORDER BY id")}
+    for match_id in hot:
+        version = stored.loc[match_id, 'version']
+        if version != start_versions[match_id] + saved[match_id]:
+            failures.append(f"match {match_id}: version {version}, expected "
+                            f"{start_versions[match_id]} + {saved[match_id]} saves")
+        score = (stored.loc[match_id, 'score1'], stored.loc[match_id, 'score2'])
+        if latest.get(match_id) != score:
+            failures.append(f"match {match_id}: stored score {score}, latest ledger result {latest.get(match_id)}")
+
+    incremental = _derived_tables()
+    run_write(rebuild_standings)
+    for name, kept, rebuilt in zip(['standings', 'head-to-head'], incremental, _derived_tables()):
+        if not kept.equals(rebuilt):
+            failures.append(f"{name} kept incrementally differ from a full rebuild")
+    return failures
+
+
+def import_leaves_writer_free(app):
+    fixtures = round_robin(TEAMS)
+    app.import_fixtures(fixtures)
+    match_id = int(app.get_matches()['id'].iloc[-1])
+    failures = []
+
+    def save_while_reading():
+        # Another session saves a score while the rest of the file is read
+        statuses = []
+        saver = threading.Thread(target=lambda: statuses.append(app.update_match_score(match_id, 1, 0)[0]), daemon=True)
+        saver.start()
+        saver.join(SAVE_TIMEOUT)
+        if statuses != ['updated']:
+            failures.append(f"a score save during an import took over {SAVE_TIMEOUT}s")
+
+    def file_read_slowly():
+        yield fixtures.iloc[:5]
+        save_while_reading()
+        yield fixtures.iloc[5:]
+
+    app.import_fixtures(file_read_slowly())
+    if len(app.get_matches()) != len(fixtures):
+        failures.append(f"{len(app.get_matches())} matches after importing {len(fixtures)}")
+
+    def file_failing():
+        yield fixtures.iloc[:5]
+        raise ValueError("unreadable row")
+
+    before = app.get_matches()
+    try:
+        app.import_fixtures(file_failing())
+        failures.append("an import whose file failed succeeded")
+    except ValueError:
+        pass
+    # The staged rows are dropped by a write queued behind the failed import
+    run_write(lambda conn: None)
+    with read_connection() as conn:
+        staged = conn.execute(f"SELECT COUNT(*) FROM {STAGING_TABLE}").fetchone()[0]
+    if staged:
+        failures.append(f"{staged} rows left staged by a failed import")
+    if not app.get_matches().equals(before):
+        failures.append("a failed import changed the tournament")
+    return failures
+
+
+def _derived_tables():
+    # The tables the ledger derives, in a fixed order to compare
+    with read_connection() as conn:
+        teams = load_teams(conn).set_index('id')[STAT_COLUMNS + ['position']].sort_index()
+        head_to_head = pd.read_sql_query("SELECT * FROM head_to_head ORDER BY team_id, opponent_id", conn)
+    return teams, head_to_head
+
+
+CHECKS = [hot_reads_use_indexes, fixture_update_ranks_teams, concurrent_saves_stay_consistent, import_leaves_writer_free]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as scratch:
+        # The database is opened in the working directory, and the app reads
+        # its admin password when imported, so both come from the scratch one
+        os.chdir(scratch)
+        os.makedirs('.streamlit')
+        with open(os.path.join('.streamlit', 'secrets.toml'), 'w') as f:
+            f.write('ADMIN_PASSWORD = "consistency-check"\n')
+        import scorecard_v1 as app
+
+        app.init_database()
+        failed = False
+        for check in CHECKS:
+            app.clear_all_data()
+            failures = check(app)
+            print(f"{check.__name__}: {'ok' if not failures else 'FAILED'}")
+            for failure in failures:
+                print(f"  {failure}")
+            failed = failed or bool(failures)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,351 @@
+"""Bulk import of league fixtures into the tournament database.
+
+The file is read and cleaned on the calling thread, a chunk at a time, and
+each chunk is staged in ``fixture_import_rows`` by a short write of its own:
+the single writer never waits on the file, so score saves from other
+sessions carry on while a large upload is read. One last write then
+replaces the tournament with the staged rows, using set-based statements:
+wipe the previous tournament, insert every match, then derive the teams and
+their standings in a single aggregate query.
+"""
+import uuid
+
+import pandas as pd
+
+from fixture_readers import CHUNK_SIZE, REQUIRED_COLUMNS
+from league_history import to_timestamp, today
+from ledger import record_completed_matches, record_result, refresh_head_to_head, refresh_standings, snapshot_teams
+from standings import write_positions
+from team_registry import alias_key, delete_unused_teams, registered_names, resolve_team_ids
+from tournament_db import clear_tables, load_matches, read_connection, run_write, submit_write
+
+MATCH_COLUMNS = ['match_name', 'team1', 'team2', 'score1', 'score2', 'completed', 'match_order', 'start_time', 'end_time']
+# The same columns in the matches table, which holds the teams' IDs
+DB_MATCH_COLUMNS = [{'team1': 'team1_id', 'team2': 'team2_id'}.get(col, col) for col in MATCH_COLUMNS]
+TIME_FORMAT = '%H:%M:%S'
+
+# Columns a fixture update compares, and the ones a blank cell in the upload
+# leaves alone because they are filled in during the tournament
+DIFF_COLUMNS = ['match_name', 'team1', 'team2', 'match_order', 'start_time', 'end_time', 'score1', 'score2']
+KEEP_IF_BLANK = ['end_time', 'score1', 'score2']
+MATCH_KEYS = ['match_name', 'match_order']
+
+# Holds the rows of imports still being read
+STAGING_TABLE = 'fixture_import_rows'
+
+
+def create_import_tables(cursor):
+    # Fixture files already loaded into the current tournament, by content hash
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS fixture_imports (
+            content_hash TEXT PRIMARY KEY,
+            file_name TEXT,
+            match_count INTEGER,
+            imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {STAGING_TABLE} (
+            import_id TEXT NOT NULL,
+            {', '.join(MATCH_COLUMNS)}
+        )
+    ''')
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{STAGING_TABLE}_import ON {STAGING_TABLE} (import_id, match_order)")
+    # Rows left by imports the server stopped in the middle of
+    cursor.execute(f"DELETE FROM {STAGING_TABLE}")
+
+
+def fixture_file_imported(content_hash):
+    """Whether a file with this content hash is already loaded."""
+    with read_connection() as conn:
+        row = conn.execute(
+            "SELECT 1 FROM fixture_imports WHERE content_hash = ?", (content_hash,)
+        ).fetchone()
+    return row is not None
+
+
+def parse_times(series):
+    """Normalise a column of times to 'HH:MM:SS' strings, None where blank or invalid."""
+    # time objects become 'HH:MM:SS' and full datetimes 'YYYY-MM-DD HH:MM:SS'
+    text = series.astype('string').str.strip()
+    parsed = pd.to_datetime(text, format=TIME_FORMAT, errors='coerce')
+
+    # Anything else that still looks like a time or datetime keeps its time of day
+    retry = parsed.isna() & text.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(text[retry], format='mixed', errors='coerce')
+
+    return parsed.dt.strftime(TIME_FORMAT).astype(object).where(parsed.notna(), None)
+
+
+def _scores(df, column):
+    if column not in df.columns:
+        return pd.Series(pd.NA, index=df.index, dtype='Int64')
+    return pd.to_numeric(df[column], errors='coerce').astype('Int64')
+
+
+def clean_fixtures(df):
+    """Turn a raw fixture sheet into rows shaped like the matches table."""
+    df = df.dropna(subset=REQUIRED_COLUMNS)
+
+    clean = pd.DataFrame({
+        'match_name': df['Match'].astype(str).str.strip(),
+        'team1': df['Team 1'].astype(str).str.strip(),
+        'team2': df['Team 2'].astype(str).str.strip(),
+        'match_order': df.index + 1,
+    }, index=df.index)
+
+    clean['start_time'] = parse_times(df['StartTime']) if 'StartTime' in df.columns else None
+    # End times are timestamps; a time of day alone is dated the day of the upload
+    day = today()
+    clean['end_time'] = df['EndTime'].map(lambda value: to_timestamp(value, day)) if 'EndTime' in df.columns else None
+
+    # Pre-filled scores only count when both sides have one
+    score1 = _scores(df, 'Score1')
+    score2 = _scores(df, 'Score2')
+    clean['completed'] = (score1.notna() & score2.notna()).astype(bool)
+    clean['score1'] = score1.where(clean['completed'])
+    clean['score2'] = score2.where(clean['completed'])
+
+    return clean[MATCH_COLUMNS]
+
+
+def import_fixtures(fixtures, content_hash=None, file_name=None):
+    """Replace the current tournament with ``fixtures``.
+
+    ``fixtures`` is a DataFrame or an iterable of DataFrame chunks such as
+    ``fixture_readers.read_fixture_chunks``; each chunk is staged as it
+    arrives so the whole file is never held in memory. ``content_hash``
+    identifies the source file so the same upload can be skipped later.
+    Returns ``(success, message)``.
+    """
+    if isinstance(fixtures, pd.DataFrame):
+        missing_cols = [col for col in REQUIRED_COLUMNS if col not in fixtures.columns]
+        if missing_cols:
+            return False, f"Missing columns: {', '.join(missing_cols)}"
+        fixtures = [fixtures]
+
+    import_id = uuid.uuid4().hex
+    staged = 0
+    try:
+        for chunk in fixtures:
+            rows = [(import_id, *row) for row in _db_rows(clean_fixtures(chunk))]
+            run_write(lambda conn: conn.executemany(f'''
+                INSERT INTO {STAGING_TABLE} (import_id, {', '.join(MATCH_COLUMNS)})
+                VALUES ({', '.join('?' * (len(MATCH_COLUMNS) + 1))})
+            ''', rows))
+            staged += len(rows)
+    except BaseException:
+        # Nobody will finish this import; the rows staged so far go
+        submit_write(lambda conn: conn.execute(f"DELETE FROM {STAGING_TABLE} WHERE import_id = ?", (import_id,)))
+        raise
+
+    match_count, team_count = run_write(_replace_tournament, import_id, staged, content_hash, file_name)
+    return True, f"Successfully imported {match_count} matches with {team_count} teams!"
+
+
+def _replace_tournament(conn, import_id, staged, content_hash, file_name):
+    # Replace the tournament with the rows staged for ``import_id``
+    match_count = conn.execute(f"SELECT COUNT(*) FROM {STAGING_TABLE} WHERE import_id = ?", (import_id,)).fetchone()[0]
+    if match_count != staged:
+        raise ValueError("The import was interrupted (the tournament was reset while the file was read)")
+
+    # Clear existing data
+    clear_tables(conn.cursor(), keep=[STAGING_TABLE])
+
+    for chunk in pd.read_sql_query(f'''
+        SELECT {', '.join(MATCH_COLUMNS)} FROM {STAGING_TABLE} WHERE import_id = ? ORDER BY match_order
+    ''', conn, params=(import_id,), chunksize=CHUNK_SIZE):
+        conn.executemany(f'''
+            INSERT INTO matches ({', '.join(DB_MATCH_COLUMNS)})
+            VALUES ({', '.join('?' * len(DB_MATCH_COLUMNS))})
+        ''', _db_rows(_with_team_ids(conn, chunk)))
+    conn.execute(f"DELETE FROM {STAGING_TABLE} WHERE import_id = ?", (import_id,))
+
+    # The teams were registered with the matches; their standings come
+    # from any pre-filled scores
+    conn.execute('''
+        UPDATE teams SET
+            matches_played = totals.matches_played,
+            goals_for = totals.goals_for,
+            goals_against = totals.goals_against,
+            points = totals.points
+        FROM (
+            SELECT team,
+                   COUNT(goals_for) AS matches_played,
+                   COALESCE(SUM(goals_for), 0) AS goals_for,
+                   COALESCE(SUM(goals_against), 0) AS goals_against,
+                   COALESCE(SUM(CASE WHEN goals_for > goals_against THEN 3
+                                     WHEN goals_for = goals_against THEN 1
+                                     ELSE 0 END), 0) AS points
+            FROM (
+                SELECT team1_id AS team, score1 AS goals_for, score2 AS goals_against FROM matches
+                UNION ALL
+                SELECT team2_id, score2, score1 FROM matches
+            )
+            GROUP BY team
+        ) AS totals
+        WHERE teams.id = totals.team
+    ''')
+    team_count = conn.execute("SELECT COUNT(*) FROM teams").fetchone()[0]
+
+    # The pre-filled scores open the ledger, with a snapshot to replay from
+    record_completed_matches(conn)
+    snapshot_teams(conn)
+    refresh_head_to_head(conn)
+    write_positions(conn)
+
+    _record_import(conn, content_hash, file_name, match_count)
+    return match_count, team_count
+
+
+def plan_fixture_update(df, key='match_name', conn=None):
+    """Diff an uploaded fixture sheet against the stored matches.
+
+    Rows are paired on ``key`` (``match_name`` or ``match_order``). Returns a
+    dict of DataFrames: ``inserts`` (new rows), ``updates`` (existing ids with
+    their new values and a readable ``changes`` column) and ``deletes``
+    (stored matches missing from the upload). Nothing is written.
+    """
+    if key not in MATCH_KEYS:
+        raise ValueError(f"Cannot match fixtures on {key!r}")
+    missing_cols = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing_cols:
+        raise ValueError(f"Missing columns: {', '.join(missing_cols)}")
+
+    clean = clean_fixtures(df)
+    if clean[key].duplicated().any():
+        raise ValueError(f"The uploaded file repeats some {key} values")
+
+    if conn is None:
+        with read_connection() as read_conn:
+            return plan_fixture_update(df, key, read_conn)
+
+    existing = load_matches(conn)
+    # Any spelling a team is registered under compares as its current name
+    names = registered_names(conn)
+    for side in ('team1', 'team2'):
+        clean[side] = clean[side].map(lambda name: names.get(alias_key(name), name))
+
+    merged = existing.merge(clean, on=key, how='outer', suffixes=('_old', ''), indicator=True)
+    paired = merged[merged['_merge'] == 'both'].copy()
+    value_columns = [col for col in DIFF_COLUMNS if col != key]
+
+    for col in KEEP_IF_BLANK:
+        paired[col] = paired[col].astype(object).where(paired[col].notna(), paired[f'{col}_old'])
+    paired['completed'] = paired['score1'].notna() & paired['score2'].notna()
+
+    changed = pd.DataFrame({col: ~_same(paired[f'{col}_old'], paired[col]) for col in value_columns})
+    updates = paired[changed.any(axis=1)].copy()
+    updates['changes'] = [
+        ', '.join(f"{col}: {_show(row[f'{col}_old'])} → {_show(row[col])}" for col in value_columns if flags[col])
+        for (_, row), (_, flags) in zip(updates.iterrows(), changed[changed.any(axis=1)].iterrows())
+    ]
+    # A stored result has to be re-recorded when its score or its teams change
+    updates['result_changed'] = updates['completed'] & changed.loc[updates.index, ['team1', 'team2', 'score1', 'score2']].any(axis=1)
+    updates['id'] = updates['id'].astype(int)
+
+    inserts = merged[merged['_merge'] == 'right_only']
+    deletes = merged[merged['_merge'] == 'left_only']
+    deletes = deletes.drop(columns=value_columns + ['completed']).rename(
+        columns={f'{col}_old': col for col in value_columns + ['completed']}
+    )
+
+    # The outer merge turns integer columns into floats
+    return {
+        'inserts': inserts[MATCH_COLUMNS].astype({'match_order': 'Int64'}).reset_index(drop=True),
+        'updates': updates[['id'] + MATCH_COLUMNS + ['result_changed', 'changes']].astype({'match_order': 'Int64'}).reset_index(drop=True),
+        'deletes': deletes[['id'] + MATCH_COLUMNS].astype({'id': int, 'match_order': 'Int64', 'completed': bool}).reset_index(drop=True),
+    }
+
+
+def apply_fixture_update(df, key='match_name', content_hash=None, file_name=None):
+    """Apply only the differences between an upload and the stored matches.
+
+    The diff is recomputed inside the write transaction so it always applies
+    to the data it was computed from. Scores and end times already entered
+    are kept unless the upload fills them in. Returns the applied plan.
+    """
+    def write(conn):
+        plan = plan_fixture_update(df, key, conn)
+        # The plan shows team names; the matches table takes their IDs
+        inserts, updates, deletes = (_with_team_ids(conn, plan[part]) for part in ('inserts', 'updates', 'deletes'))
+        results_changed = False
+
+        if not updates.empty:
+            conn.executemany(f'''
+                UPDATE matches SET {', '.join(f'{col} = ?' for col in DB_MATCH_COLUMNS)}, version = version + 1
+                WHERE id = ?
+            ''', _db_rows(updates[MATCH_COLUMNS + ['id']]))
+            for row in updates[updates['result_changed']].itertuples():
+                record_result(conn, row.id, int(row.team1), int(row.team2), int(row.score1), int(row.score2))
+                results_changed = True
+
+        for row in deletes.itertuples():
+            conn.execute("DELETE FROM matches WHERE id = ?", (row.id,))
+            if row.completed:
+                # Void the result so it drops out of the standings
+                record_result(conn, row.id, int(row.team1), int(row.team2), None, None)
+                results_changed = True
+
+        for row in _db_rows(inserts):
+            cursor = conn.execute(f'''
+                INSERT INTO matches ({', '.join(DB_MATCH_COLUMNS)})
+                VALUES ({', '.join('?' * len(DB_MATCH_COLUMNS))})
+            ''', row)
+            values = dict(zip(MATCH_COLUMNS, row))
+            if values['completed']:
+                record_result(conn, cursor.lastrowid, values['team1'], values['team2'], values['score1'], values['score2'])
+                results_changed = True
+
+        if results_changed:
+            refresh_standings(conn)
+        # Teams dropped from the fixture list
+        delete_unused_teams(conn)
+        # Rank the teams the update added, whether or not any result changed
+        write_positions(conn)
+
+        # The stored matches are now the upload's rows
+        match_count = conn.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+        _record_import(conn, content_hash, file_name, match_count)
+        return plan
+
+    return run_write(write)
+
+
+def _same(old, new):
+    """Element-wise equality that treats two blanks as equal and 2 == 2.0."""
+    old_num = pd.to_numeric(old, errors='coerce')
+    new_num = pd.to_numeric(new, errors='coerce')
+    numeric = old_num.notna() & new_num.notna()
+    both_blank = old.isna() & new.isna()
+    same_text = old.astype(object).astype(str) == new.astype(object).astype(str)
+    return both_blank | (numeric & (old_num == new_num)) | (~numeric & old.notna() & new.notna() & same_text)
+
+
+def _show(value):
+    if pd.isna(value):
+        return 'blank'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _with_team_ids(conn, frame):
+    # ``frame`` with the team names replaced by their IDs, registering new teams
+    ids = resolve_team_ids(conn, pd.unique(pd.concat([frame['team1'], frame['team2']])))
+    return frame.assign(team1=frame['team1'].map(ids), team2=frame['team2'].map(ids))
+
+
+def _db_rows(frame):
+    return frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None)
+
+
+def _record_import(conn, content_hash, file_name, match_count):
+    # Only the file the tournament now reflects counts as imported
+    conn.execute("DELETE FROM fixture_imports")
+    if content_hash is not None:
+        conn.execute('''
+            INSERT OR REPLACE INTO fixture_imports (content_hash, file_name, match_count)
+            VALUES (?, ?, ?)
+        ''', (content_hash, file_name, match_count))
@@ -0,0 +1,148 @@
+"""Streaming readers for fixture files.
+
+Each reader turns a file into DataFrame chunks with the fixture sheet
+columns (``Match``, ``Team 1``, ``Team 2``, ``StartTime``, ``EndTime``,
+``Score1``, ``Score2``), so large exports load with flat memory use. New
+formats are added by registering a reader for their file extensions.
+"""
+import os
+
+import openpyxl
+import pandas as pd
+
+REQUIRED_COLUMNS = ['Match', 'Team 1', 'Team 2']
+FIXTURE_COLUMNS = REQUIRED_COLUMNS + ['StartTime', 'EndTime', 'Score1', 'Score2']
+CHUNK_SIZE = 500
+
+READERS = {}
+
+
+def register_reader(*extensions):
+    """Register a reader ``fn(source, chunk_size)`` yielding raw chunks."""
+    def decorator(fn):
+        for extension in extensions:
+            READERS[extension] = fn
+        return fn
+    return decorator
+
+
+def supported_extensions():
+    return sorted(ext.lstrip('.') for ext in READERS)
+
+
+def read_fixture_chunks(source, file_name=None, chunk_size=CHUNK_SIZE, progress=None):
+    """Yield fixture chunks from ``source`` (a path or file-like object).
+
+    The format is picked from ``file_name`` (or the path). Every chunk has
+    exactly FIXTURE_COLUMNS, missing optional columns filled with None, and
+    an index that keeps counting across chunks so row order is preserved.
+    ``progress(rows_read, fraction)`` is called after each chunk; fraction
+    is None when the reader cannot tell how far through the file it is.
+    """
+    file_name = file_name or getattr(source, 'name', None) or str(source)
+    extension = os.path.splitext(file_name)[1].lower()
+    reader = READERS.get(extension)
+    if reader is None:
+        raise ValueError(f"Unsupported fixture file type: {extension or file_name}")
+
+    total_bytes = _size_of(source)
+    rows_read = 0
+    for chunk in reader(source, chunk_size):
+        if rows_read == 0:
+            missing_cols = [col for col in REQUIRED_COLUMNS if col not in chunk.columns]
+            if missing_cols:
+                raise ValueError(f"Missing columns: {', '.join(missing_cols)}")
+
+        # Readers that know their row count report progress themselves
+        fraction = chunk.attrs.get('fraction')
+        if fraction is None:
+            fraction = _fraction_read(source, total_bytes)
+
+        chunk = chunk.reindex(columns=FIXTURE_COLUMNS)
+        chunk.index = pd.RangeIndex(rows_read, rows_read + len(chunk))
+        rows_read += len(chunk)
+        yield chunk
+
+        if progress is not None:
+            progress(rows_read, fraction)
+
+
+def read_fixtures(source, file_name=None, progress=None):
+    """Read a whole fixture file into one DataFrame."""
+    chunks = list(read_fixture_chunks(source, file_name, progress=progress))
+    if not chunks:
+        return pd.DataFrame(columns=FIXTURE_COLUMNS)
+    return pd.concat(chunks)
+
+
+@register_reader('.csv')
+def _read_csv(source, chunk_size):
+    yield from pd.read_csv(source, chunksize=chunk_size, skipinitialspace=True)
+
+
+@register_reader('.jsonl', '.ndjson')
+def _read_json_lines(source, chunk_size):
+    with pd.read_json(source, lines=True, chunksize=chunk_size) as reader:
+        yield from reader
+
+
+@register_reader('.xlsx', '.xlsm')
+def _read_xlsx(source, chunk_size):
+    # Read-only mode streams rows from the sheet XML instead of building the
+    # whole workbook in memory
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        total_rows = sheet.max_row  # from the sheet's dimension tag, may be missing
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(name).strip() if name is not None else f'Unnamed: {i}' for i, name in enumerate(header)]
+
+        def make_chunk(buffer, rows_done):
+            chunk = pd.DataFrame(buffer, columns=columns)
+            if total_rows:
+                chunk.attrs['fraction'] = min(rows_done / total_rows, 1.0)
+            return chunk
+
+        buffer = []
+        rows_done = 1
+        for row in rows:
+            buffer.append(row)
+            rows_done += 1
+            if len(buffer) == chunk_size:
+                yield make_chunk(buffer, rows_done)
+                buffer = []
+        if buffer:
+            yield make_chunk(buffer, rows_done)
+    finally:
+        workbook.close()
+
+
+@register_reader('.xls')
+def _read_xls(source, chunk_size):
+    # The legacy format has no streaming reader
+    df = pd.read_excel(source)
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size]
+
+
+def _size_of(source):
+    try:
+        if hasattr(source, 'getbuffer'):
+            return source.getbuffer().nbytes
+        if hasattr(source, 'seek'):
+            return None
+        return os.path.getsize(source)
+    except (OSError, TypeError):
+        return None
+
+
+def _fraction_read(source, total_bytes):
+    if not total_bytes or not hasattr(source, 'tell'):
+        return None
+    try:
+        return min(source.tell() / total_bytes, 1.0)
+    except (OSError, ValueError):
+        return None
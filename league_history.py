@@ -0,0 +1,172 @@
+"""The league table as it stood after any completed match, or at any time.
+
+Completed matches are read in the order they finished - ``end_time``, an
+ISO 8601 timestamp, then fixture order - from an index kept in that order
+(tournament_db.HISTORY_QUERY). Each match adds its result to both teams'
+totals, and one cumulative sum over the sequence gives every team's totals
+after every match, so:
+
+- the table after match N is row N of the prefix sums, ranked by the
+  tiebreakers in standings.py
+- the table at a given time is the table after the last match that had
+  finished by then, found by a binary search over the end times
+- positions over time rank each row in turn, bringing the head-to-head
+  results forward one match at a time instead of recounting them
+
+Results entered without an end time (pre-filled in a fixture file) count as
+finished before every timed one.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from standings import HeadToHead, LeagueTable, rank_order
+
+# The tournament's time zone: end times are stored with its offset, and
+# times given without one are taken to be in it
+TIMEZONE = 'Asia/Kolkata'
+
+TOTAL_COLUMNS = ['matches_played', 'goals_for', 'goals_against', 'points']
+
+_DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+def now_timestamp():
+    """The current time as stored in ``matches.end_time``."""
+    return pd.Timestamp.now(tz=TIMEZONE).isoformat(timespec='seconds')
+
+
+def to_timestamp(value, day):
+    """``value`` as stored in ``matches.end_time``, or None if blank or not a time.
+
+    A time of day on its own is taken to be on ``day`` (``'YYYY-MM-DD'``),
+    and a time without an offset to be in the tournament's time zone.
+    """
+    if value is None or pd.isna(value):
+        return None
+    text = str(value).strip()
+    try:
+        stamp = pd.Timestamp(text if _DATE.match(text) else f"{day} {text}")
+    except ValueError:
+        return None
+    if pd.isna(stamp):
+        return None
+    stamp = stamp.tz_localize(TIMEZONE) if stamp.tzinfo is None else stamp.tz_convert(TIMEZONE)
+    return stamp.isoformat(timespec='seconds')
+
+
+def today():
+    """Today's date in the tournament's time zone, as ``'YYYY-MM-DD'``."""
+    return pd.Timestamp.now(tz=TIMEZONE).strftime('%Y-%m-%d')
+
+
+def timestamp_end_times(cursor):
+    """Turn end times stored as bare times of day into timestamps.
+
+    Every match keeps its time of day, which is what orders the finished
+    ones. A completed match is dated the day its current result was
+    recorded in the ledger, any other the day this runs. Only a completed
+    match whose time cannot be read takes the recorded time itself: on a
+    database older than the ledger, that is when the ledger was seeded.
+    """
+    legacy = pd.read_sql_query('''
+        SELECT id, end_time,
+               CASE WHEN completed THEN (
+                   SELECT recorded_at FROM match_events WHERE match_id = matches.id ORDER BY id DESC LIMIT 1
+               ) END AS recorded_at
+        FROM matches
+        WHERE end_time IS NOT NULL AND end_time NOT LIKE '____-__-__%'
+    ''', cursor.connection)
+    if legacy.empty:
+        return
+
+    day = today()
+    stamps = []
+    for end_time, recorded_at in zip(legacy['end_time'], legacy['recorded_at']):
+        # The ledger records in UTC
+        recorded = to_timestamp(f"{recorded_at}+00:00", day) if recorded_at is not None else None
+        stamps.append(to_timestamp(end_time, recorded[:10] if recorded else day) or recorded)
+    cursor.executemany("UPDATE matches SET end_time = ? WHERE id = ?", zip(stamps, legacy['id'].astype(int).tolist()))
+
+
+class LeagueHistory:
+    """Every team's totals after each completed match, in the order they finished.
+
+    ``matches`` is the HISTORY_QUERY read and ``teams`` the standings read
+    (for the teams' IDs, names and fair play points).
+    """
+
+    def __init__(self, matches, teams):
+        self.matches = matches.reset_index(drop=True)
+        self.teams = teams[['id', 'name', 'fair_play_points']].reset_index(drop=True)
+
+        index = pd.Index(self.teams['id'])
+        self._team1 = index.get_indexer(self.matches['team1_id'])
+        self._team2 = index.get_indexer(self.matches['team2_id'])
+        self._score1 = self.matches['score1'].to_numpy(dtype=np.int64)
+        self._score2 = self.matches['score2'].to_numpy(dtype=np.int64)
+
+        # Row n + 1 holds what match n adds; the prefix sums are the totals
+        # after each match, with row 0 the table before any
+        changes = np.zeros((len(self.matches) + 1, len(self.teams), len(TOTAL_COLUMNS)), dtype=np.int64)
+        step = np.arange(1, len(self.matches) + 1)
+        for team, scored, conceded in [(self._team1, self._score1, self._score2),
+                                       (self._team2, self._score2, self._score1)]:
+            points = np.select([scored > conceded, scored == conceded], [3, 1], 0)
+            changes[step, team] = np.stack([np.ones_like(scored), scored, conceded, points], axis=1)
+        self.totals = changes.cumsum(axis=0)
+
+        # In UTC; untimed results sort first, so they go before the earliest time
+        end_times = pd.to_datetime(self.matches['end_time'], format='ISO8601', utc=True, errors='coerce').dt.tz_localize(None)
+        self._end_times = end_times.fillna(pd.Timestamp.min).to_numpy(dtype='datetime64[ns]')
+
+    def __len__(self):
+        return len(self.matches)
+
+    def matches_by(self, when):
+        """How many completed matches had finished by ``when`` (a timestamp or ISO string)."""
+        when = pd.Timestamp(when)
+        if when.tzinfo is None:
+            when = when.tz_localize(TIMEZONE)
+        return int(np.searchsorted(self._end_times, when.tz_convert('UTC').tz_localize(None).to_datetime64(), side='right'))
+
+    def table_after(self, n, rules=None):
+        """The league table after the first ``n`` completed matches, best first.
+
+        Shaped like the standings read, ``position`` included.
+        """
+        n = max(0, min(n, len(self)))
+        h2h = HeadToHead(self.teams['id'], [])
+        h2h.add(self._team1[:n], self._team2[:n], self._score1[:n], self._score2[:n])
+        order = rank_order(self._table(n, h2h), rules)
+
+        table = self.teams.assign(**dict(zip(TOTAL_COLUMNS, self.totals[n].T))).iloc[order]
+        table['goal_difference'] = table['goals_for'] - table['goals_against']
+        table['position'] = np.arange(1, len(table) + 1)
+        return table[['id', 'name', 'matches_played', 'goals_for', 'goals_against', 'goal_difference',
+                      'points', 'fair_play_points', 'position']].reset_index(drop=True)
+
+    def table_at(self, when, rules=None):
+        """The league table as it stood at ``when``."""
+        return self.table_after(self.matches_by(when), rules)
+
+    def positions(self, rules=None):
+        """Each team's position after every completed match.
+
+        One row per match in the order they finished (indexed 1..N), one
+        column per team name.
+        """
+        positions = np.zeros((len(self), len(self.teams)), dtype=np.int64)
+        h2h = HeadToHead(self.teams['id'], [])
+        for n in range(1, len(self) + 1):
+            m = n - 1
+            h2h.add(self._team1[m], self._team2[m], self._score1[m], self._score2[m])
+            positions[m, rank_order(self._table(n, h2h), rules)] = np.arange(1, len(self.teams) + 1)
+        return pd.DataFrame(positions, index=pd.RangeIndex(1, len(self) + 1, name='after_match'),
+                            columns=self.teams['name'])
+
+    def _table(self, n, h2h):
+        totals = self.totals[n]
+        return LeagueTable(self.teams['id'], totals[:, 3], totals[:, 1], totals[:, 2],
+                           self.teams['fair_play_points'], h2h)
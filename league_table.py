@@ -0,0 +1,93 @@
+"""HTML for the league table on the scoreboard.
+
+The whole table is one ``st.markdown`` payload: a single stylesheet shared
+by every row, then one compiled row template filled in per team. A row's
+look comes from its zone class (champion, medal, Europe, safe, relegation)
+rather than from per-row CSS, so a 64-team league costs 64 short rows.
+"""
+import html
+
+SCOREBOARD_CSS = """<style>
+.league-row { padding: 12px; margin-bottom: 8px; border-radius: 10px; border-left: 6px solid #9E9E9E; background: #F5F5F5; box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1); }
+.league-row.zone-champion { background: #FFD700; border-left-color: #FFA000; }
+.league-row.zone-medal { background: #E8F5E8; border-left-color: #4CAF50; }
+.league-row.zone-europe { background: #FFF3E0; border-left-color: #FF9800; }
+.league-row.zone-relegation { background: #FFEBEE; border-left-color: #F44336; }
+.league-content { display: flex; flex-direction: column; }
+.league-team { display: flex; align-items: center; margin-bottom: 8px; }
+.league-position { font-weight: bold; font-size: 1rem; margin-right: 8px; color: #000000; }
+.league-name { font-size: 1rem; font-weight: 600; color: #000; }
+.league-stats { display: flex; justify-content: space-between; gap: 1rem; }
+.league-stat { text-align: center; }
+.league-label { font-size: 0.7rem; color: #000000; }
+.league-value { font-size: 1rem; font-weight: 600; color: #000000; }
+.league-value.gd-up { color: green; }
+.league-value.gd-down { color: red; }
+.league-value.gd-level { color: orange; }
+.league-value.points { color: #1B5E20; }
+@media (min-width: 600px) {
+.league-content { flex-direction: row; justify-content: space-between; align-items: center; }
+.league-team { margin-bottom: 0; }
+}
+</style>"""
+
+# No line may start with four spaces, or Markdown would turn it into a code block
+_ROW = (
+    '<div class="league-row zone-{zone}"><div class="league-content">'
+    '<div class="league-team"><span class="league-position">{position}</span>'
+    '<span class="league-name">{indicator} {name}</span></div>'
+    '<div class="league-stats">'
+    '<div class="league-stat"><div class="league-label">Played</div><div class="league-value">{played}</div></div>'
+    '<div class="league-stat"><div class="league-label">GF</div><div class="league-value">{goals_for}</div></div>'
+    '<div class="league-stat"><div class="league-label">GA</div><div class="league-value">{goals_against}</div></div>'
+    '<div class="league-stat"><div class="league-label">GD</div><div class="league-value {gd_class}">{gd:+d}</div></div>'
+    '<div class="league-stat"><div class="league-label">Points</div><div class="league-value points">{points}</div></div>'
+    '</div></div></div>'
+)
+render_row = _ROW.format
+
+
+def position_zone(position, team_count):
+    """Return ``(zone class, indicator)`` for a league position."""
+    if position == 1:
+        return 'champion', "👑"  # Crown for champion
+    if position == 2:
+        return 'medal', "🥈"  # Silver medal
+    if position == 3:
+        return 'medal', "🥉"  # Bronze medal
+    if position == 4:
+        return 'europe', "⚡"  # Lightning for European competition
+    if position <= 6:
+        return 'europe', "🏆"  # Trophy for European spots
+    if position <= team_count - 3:
+        return 'safe', "⚽"  # Football for safe positions
+    return 'relegation', "🔻"  # Red triangle for relegation zone
+
+
+def render_league_table(teams_df):
+    """Return the league table HTML for teams already in standings order."""
+    team_count = len(teams_df)
+    rows = []
+    for position, name, played, goals_for, goals_against, points in zip(
+        range(1, team_count + 1),
+        teams_df['name'],
+        teams_df['matches_played'],
+        teams_df['goals_for'],
+        teams_df['goals_against'],
+        teams_df['points'],
+    ):
+        zone, indicator = position_zone(position, team_count)
+        gd = int(goals_for - goals_against)
+        rows.append(render_row(
+            zone=zone,
+            position=position,
+            indicator=indicator,
+            name=html.escape(str(name)),
+            played=played,
+            goals_for=goals_for,
+            goals_against=goals_against,
+            gd=gd,
+            gd_class='gd-up' if gd > 0 else 'gd-down' if gd < 0 else 'gd-level',
+            points=points,
+        ))
+    return SCOREBOARD_CSS + '\n<div class="league-table">' + ''.join(rows) + '</div>'
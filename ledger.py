@@ -0,0 +1,278 @@
+"""Append-only ledger of league results and the standings derived from it.
+
+Every score entered for a league match is appended to ``match_events``; the
+latest event for a match is its current result (NULL scores void it). The
+``teams`` table is only a materialised view of the ledger: it is rebuilt from
+the most recent standings snapshot plus the events recorded after it, or from
+scratch in a single vectorised pass over the whole ledger.
+
+Teams are referred to by their ``teams.id`` throughout (see team_registry.py).
+
+``head_to_head`` holds the results between every pair of teams, one row per
+team and opponent, for the tiebreakers in standings.py. It is kept up to
+date incrementally: only the events recorded since it was last brought up
+to date are applied to it.
+
+All functions take a connection that is already inside a write transaction.
+"""
+import numpy as np
+import pandas as pd
+
+from standings import write_positions
+from team_registry import replace_team_names
+from tournament_db import has_column
+
+STAT_COLUMNS = ['matches_played', 'goals_for', 'goals_against', 'points']
+
+# Take a fresh snapshot once this many events have piled up after the last one
+SNAPSHOT_EVERY = 25
+
+
+def create_ledger_tables(cursor):
+    # Tables derived from the ledger that were keyed by team name before
+    # team IDs: dropped, and rebuilt from the ledger when next brought up to date
+    if has_column(cursor, 'standings_snapshot_rows', 'team'):
+        cursor.execute("DROP TABLE standings_snapshot_rows")
+        cursor.execute("DROP TABLE IF EXISTS standings_snapshots")
+    if has_column(cursor, 'head_to_head', 'team'):
+        cursor.execute("DROP TABLE head_to_head")
+        cursor.execute("DROP TABLE IF EXISTS head_to_head_applied")
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS match_events (
+            id INTEGER PRIMARY KEY,
+            match_id INTEGER NOT NULL,
+            team1_id INTEGER REFERENCES teams (id),
+            team2_id INTEGER REFERENCES teams (id),
+            score1 INTEGER,
+            score2 INTEGER,
+            recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_match_events_match ON match_events (match_id, id)")
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS standings_snapshots (
+            id INTEGER PRIMARY KEY,
+            last_event_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS standings_snapshot_rows (
+            snapshot_id INTEGER NOT NULL,
+            team_id INTEGER NOT NULL REFERENCES teams (id),
+            matches_played INTEGER DEFAULT 0,
+            goals_for INTEGER DEFAULT 0,
+            goals_against INTEGER DEFAULT 0,
+            points INTEGER DEFAULT 0,
+            PRIMARY KEY (snapshot_id, team_id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS head_to_head (
+            team_id INTEGER NOT NULL REFERENCES teams (id),
+            opponent_id INTEGER NOT NULL REFERENCES teams (id),
+            matches_played INTEGER DEFAULT 0,
+            goals_for INTEGER DEFAULT 0,
+            goals_against INTEGER DEFAULT 0,
+            points INTEGER DEFAULT 0,
+            PRIMARY KEY (team_id, opponent_id)
+        )
+    ''')
+    # The last match event counted in head_to_head (one row, none when empty)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS head_to_head_applied (
+            last_event_id INTEGER NOT NULL
+        )
+    ''')
+
+    # Ledgers from before team IDs
+    replace_team_names(cursor, 'match_events')
+
+    # Databases from before the ledger existed: seed it from the scores
+    # already stored on the matches so a rebuild does not lose them.
+    cursor.execute('''
+        INSERT INTO match_events (match_id, team1_id, team2_id, score1, score2)
+        SELECT id, team1_id, team2_id, score1, score2 FROM matches
+        WHERE completed AND NOT EXISTS (SELECT 1 FROM match_events)
+        ORDER BY match_order
+    ''')
+
+
+def record_result(conn, match_id, team1_id, team2_id, score1, score2):
+    """Append the current result of a league match to the ledger."""
+    conn.execute('''
+        INSERT INTO match_events (match_id, team1_id, team2_id, score1, score2)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (match_id, team1_id, team2_id, score1, score2))
+
+
+def record_completed_matches(conn):
+    """Append the stored result of every completed match in one statement."""
+    conn.execute('''
+        INSERT INTO match_events (match_id, team1_id, team2_id, score1, score2)
+        SELECT id, team1_id, team2_id, score1, score2 FROM matches
+        WHERE completed
+        ORDER BY match_order
+    ''')
+
+
+def snapshot_teams(conn):
+    """Snapshot the teams table as it stands, covering every recorded event."""
+    cursor = conn.execute(
+        "INSERT INTO standings_snapshots (last_event_id) SELECT COALESCE(MAX(id), 0) FROM match_events"
+    )
+    conn.execute('''
+        INSERT INTO standings_snapshot_rows (snapshot_id, team_id, matches_played, goals_for, goals_against, points)
+        SELECT ?, id, matches_played, goals_for, goals_against, points FROM teams
+    ''', (cursor.lastrowid,))
+
+
+def team_totals(results):
+    """Aggregate per-team totals from a frame with one row per match result.
+
+    ``results`` has ``team1_id``, ``team2_id``, ``score1`` and ``score2``
+    columns, like match_events; the totals are indexed by team ID.
+    """
+    return _sides(results).groupby('team')[STAT_COLUMNS].sum()
+
+
+def pair_totals(results):
+    """Aggregate totals per (team, opponent) pair, like team_totals."""
+    return _sides(results).groupby(['team', 'opponent'])[STAT_COLUMNS].sum()
+
+
+def _sides(results):
+    # Each result seen from both teams' side
+    results = results.dropna(subset=['score1', 'score2'])
+    score1 = results['score1'].astype(int).to_numpy()
+    score2 = results['score2'].astype(int).to_numpy()
+
+    rows = pd.DataFrame({
+        'team': np.concatenate([results['team1_id'].to_numpy(), results['team2_id'].to_numpy()]),
+        'opponent': np.concatenate([results['team2_id'].to_numpy(), results['team1_id'].to_numpy()]),
+        'goals_for': np.concatenate([score1, score2]),
+        'goals_against': np.concatenate([score2, score1]),
+    })
+    rows['matches_played'] = 1
+    rows['points'] = np.select(
+        [rows['goals_for'] > rows['goals_against'], rows['goals_for'] == rows['goals_against']],
+        [3, 1],
+        0,
+    )
+    return rows
+
+
+def _latest_per_match(events):
+    return events.sort_values('id').drop_duplicates('match_id', keep='last')
+
+
+def rebuild_standings(conn):
+    """Recompute the standings from the whole ledger and snapshot them."""
+    events = pd.read_sql_query("SELECT * FROM match_events", conn)
+    standings = team_totals(_latest_per_match(events))
+    last_event_id = int(events['id'].max()) if not events.empty else 0
+
+    _write_teams(conn, standings)
+    _take_snapshot(conn, standings, last_event_id)
+
+    conn.execute("DELETE FROM head_to_head")
+    conn.execute("DELETE FROM head_to_head_applied")
+    refresh_head_to_head(conn)
+    write_positions(conn)
+    return standings
+
+
+def refresh_standings(conn):
+    """Bring the teams table up to date: latest snapshot + newer events."""
+    snapshot = conn.execute(
+        "SELECT id, last_event_id FROM standings_snapshots ORDER BY id DESC LIMIT 1"
+    ).fetchone()
+    if snapshot is None:
+        return rebuild_standings(conn)
+    snapshot_id, last_event_id = snapshot
+
+    base = pd.read_sql_query(
+        "SELECT * FROM standings_snapshot_rows WHERE snapshot_id = ?", conn, params=(snapshot_id,)
+    ).set_index('team_id')[STAT_COLUMNS]
+    tail = pd.read_sql_query(
+        "SELECT * FROM match_events WHERE id > ?", conn, params=(last_event_id,)
+    )
+    if tail.empty:
+        standings = base
+    else:
+        # Results the snapshot already counted for the matches edited since
+        before = pd.read_sql_query('''
+            SELECT * FROM match_events
+            WHERE id <= ? AND match_id IN (SELECT match_id FROM match_events WHERE id > ?)
+        ''', conn, params=(last_event_id, last_event_id))
+
+        standings = (
+            base
+            .sub(team_totals(_latest_per_match(before)), fill_value=0)
+            .add(team_totals(_latest_per_match(tail)), fill_value=0)
+            .astype(int)
+        )
+
+    _write_teams(conn, standings)
+    if len(tail) >= SNAPSHOT_EVERY:
+        _take_snapshot(conn, standings, int(tail['id'].max()))
+    refresh_head_to_head(conn)
+    write_positions(conn)
+    return standings
+
+
+def refresh_head_to_head(conn):
+    """Apply the events recorded since head_to_head was last brought up to date."""
+    row = conn.execute("SELECT last_event_id FROM head_to_head_applied").fetchone()
+    last_event_id = row[0] if row else 0
+    tail = pd.read_sql_query("SELECT * FROM match_events WHERE id > ?", conn, params=(last_event_id,))
+    if tail.empty:
+        return
+
+    # Take back what the matches edited since counted before, add what they count now
+    before = pd.read_sql_query('''
+        SELECT * FROM match_events
+        WHERE id <= ? AND match_id IN (SELECT match_id FROM match_events WHERE id > ?)
+    ''', conn, params=(last_event_id, last_event_id))
+    change = (
+        pair_totals(_latest_per_match(tail))
+        .sub(pair_totals(_latest_per_match(before)), fill_value=0)
+        .astype(int)
+    )
+    change = change[(change != 0).any(axis=1)]
+
+    conn.executemany('''
+        INSERT INTO head_to_head (team_id, opponent_id, matches_played, goals_for, goals_against, points)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (team_id, opponent_id) DO UPDATE SET
+            matches_played = matches_played + excluded.matches_played,
+            goals_for = goals_for + excluded.goals_for,
+            goals_against = goals_against + excluded.goals_against,
+            points = points + excluded.points
+    ''', [(int(team), int(opponent), *map(int, row)) for (team, opponent), row in zip(change.index, change[STAT_COLUMNS].to_numpy())])
+    conn.execute("DELETE FROM head_to_head WHERE matches_played = 0")
+
+    conn.execute("DELETE FROM head_to_head_applied")
+    conn.execute("INSERT INTO head_to_head_applied (last_event_id) VALUES (?)", (int(tail['id'].max()),))
+
+
+def _take_snapshot(conn, standings, last_event_id):
+    cursor = conn.execute(
+        "INSERT INTO standings_snapshots (last_event_id) VALUES (?)", (last_event_id,)
+    )
+    snapshot_id = cursor.lastrowid
+    conn.executemany('''
+        INSERT INTO standings_snapshot_rows (snapshot_id, team_id, matches_played, goals_for, goals_against, points)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [(snapshot_id, int(team), *map(int, row)) for team, row in zip(standings.index, standings[STAT_COLUMNS].to_numpy())])
+
+
+def _write_teams(conn, standings):
+    conn.execute("UPDATE teams SET matches_played = 0, goals_for = 0, goals_against = 0, points = 0")
+    conn.executemany('''
+        UPDATE teams SET matches_played = ?, goals_for = ?, goals_against = ?, points = ?
+        WHERE id = ?
+    ''', [(*map(int, row), int(team)) for team, row in zip(standings.index, standings[STAT_COLUMNS].to_numpy())])
@@ -0,0 +1,223 @@
+"""Each team's chances of every final league position, and of the top-4 cut.
+
+The league matches still to play are played out many times from a score
+model. Each simulated league is ranked by the same tiebreak rules as the
+real table (standings.RULES). The simulations run in batches, and a whole
+batch takes a handful of array operations:
+
+- every match, played or simulated, is two results, one from each side,
+  kept as small integers with each team's results in adjacent columns; a
+  team's totals are one np.add.reduceat over its columns
+- the rules that only look at a team's own figures read (simulations x
+  teams) arrays; the head-to-head rules sum only the results between
+  teams still level in that simulation
+- teams still level share a label, and one lexsort over every simulation
+  at once splits them by the next run of rules
+
+Goals are Poisson. A side's expected goals are its attack rating times the
+opponent's defence rating over the league's mean goals per side. Ratings
+are goals scored and conceded per match, shrunk towards the mean by
+PRIOR_MATCHES average matches so one early result does not decide them.
+
+A batch holds about BATCH_RESULTS results, so leagues with more matches
+run fewer simulations per batch and a batch stays a few tens of MB. Batches
+can be spread over a process pool (``workers``), e.g. from the command
+line: ``python qualification.py [simulations] [workers]``.
+"""
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from standings import GROUP_RULES, RULES, LeagueTable, rule_runs
+from tournament_db import load_matches, load_teams, read_snapshot
+
+# The top four play the semi-finals (generate_knockout_bracket)
+QUALIFIERS = 4
+# Average matches every team's ratings start from
+PRIOR_MATCHES = 3
+# Mean goals per side before any goal has been scored
+DEFAULT_GOALS = 1.5
+# Most simulations per batch (and per task handed to a worker), and the
+# most results (simulations x results per league) a batch holds
+BATCH_SIZE = 10_000
+BATCH_RESULTS = 2_000_000
+
+
+class SimulatedLeague:
+    """The played results and the expected goals of the matches still to play.
+
+    ``matches`` is the fixtures read and ``teams`` the standings read.
+    """
+
+    def __init__(self, matches, teams):
+        self.ids = teams['id'].to_numpy(dtype=np.int64)
+        self.fair_play_points = teams['fair_play_points'].fillna(0).to_numpy(dtype=np.int64)
+
+        index = pd.Index(self.ids)
+        completed = matches['completed'].astype(bool)
+        played, remaining = matches[completed], matches[~completed]
+        team1, team2 = index.get_indexer(played['team1_id']), index.get_indexer(played['team2_id'])
+        score1 = played['score1'].to_numpy(dtype=np.int64)
+        score2 = played['score2'].to_numpy(dtype=np.int64)
+        # Each played match from both sides
+        self.played_team = np.concatenate([team1, team2])
+        self.played_opponent = np.concatenate([team2, team1])
+        self.played_for = np.concatenate([score1, score2])
+        self.played_against = np.concatenate([score2, score1])
+
+        self.team1 = index.get_indexer(remaining['team1_id'])
+        self.team2 = index.get_indexer(remaining['team2_id'])
+
+        # Every result of a simulated league, played or not, from both sides,
+        # in columns by team; result_columns[i] is the i-th one's in the order above
+        team = np.concatenate([self.played_team, self.team1, self.team2])
+        order = np.argsort(team, kind='stable')
+        self.result_team = team[order]
+        self.result_opponent = np.concatenate([self.played_opponent, self.team2, self.team1])[order]
+        self.result_columns = np.empty_like(order)
+        self.result_columns[order] = np.arange(len(order))
+
+        matches_played = np.bincount(self.played_team, minlength=len(self.ids))
+        goals_for = np.bincount(self.played_team, self.played_for, minlength=len(self.ids))
+        goals_against = np.bincount(self.played_team, self.played_against, minlength=len(self.ids))
+        mean = (goals_for.sum() / matches_played.sum() if matches_played.sum() else 0) or DEFAULT_GOALS
+        attack = (goals_for + PRIOR_MATCHES * mean) / (matches_played + PRIOR_MATCHES)
+        defence = (goals_against + PRIOR_MATCHES * mean) / (matches_played + PRIOR_MATCHES)
+        self.expected1 = attack[self.team1] * defence[self.team2] / mean
+        self.expected2 = attack[self.team2] * defence[self.team1] / mean
+
+    def batch_size(self):
+        """Simulations per batch: BATCH_SIZE, or fewer to keep to BATCH_RESULTS."""
+        return max(1, min(BATCH_SIZE, BATCH_RESULTS // max(len(self.result_team), 1)))
+
+    def count_positions(self, simulations, seed, rules=None):
+        """``counts[i, p]``: how many of ``simulations`` leagues team ``i`` finished ``p + 1``th in."""
+        rng = np.random.default_rng(seed)
+        goals1 = rng.poisson(self.expected1, (simulations, len(self.team1)))
+        goals2 = rng.poisson(self.expected2, (simulations, len(self.team2)))
+
+        goals_for = np.empty((simulations, len(self.result_team)), dtype=np.int16)
+        goals_against = np.empty_like(goals_for)
+        played, remaining = len(self.played_team), len(self.team1)
+        columns = np.split(self.result_columns, [played, played + remaining])
+        for side, scored, conceded in zip(columns, [self.played_for, goals1, goals2],
+                                          [self.played_against, goals2, goals1]):
+            goals_for[:, side] = scored
+            goals_against[:, side] = conceded
+        del goals1, goals2
+
+        results = SimulatedHeadToHead(self.result_team, self.result_opponent, goals_for, goals_against, len(self.ids))
+        table = LeagueTable(self.ids, results.total(results.points), results.total(results.goals_for),
+                            results.total(results.goals_against), self.fair_play_points, results)
+        positions = rank_positions(table, rules)
+
+        team_count = len(self.ids)
+        cells = np.arange(team_count) * team_count + positions - 1
+        return np.bincount(cells.ravel(), minlength=team_count * team_count).reshape(team_count, team_count)
+
+
+class SimulatedHeadToHead:
+    """The results of a batch of simulated leagues, one column per side of a match.
+
+    ``team`` must be sorted, so each team's results are adjacent columns.
+    Stands in for standings.HeadToHead in a LeagueTable whose columns are
+    (simulations x teams) arrays: ``among`` takes, for every simulation, the
+    label of the group each team is level in.
+    """
+
+    def __init__(self, team, opponent, goals_for, goals_against, team_count):
+        self.team, self.opponent = team, opponent
+        self.goals_for, self.goals_against = goals_for, goals_against
+        self.points = np.zeros(goals_for.shape, dtype=np.int8)
+        self.points[goals_for > goals_against] = 3
+        self.points[goals_for == goals_against] = 1
+
+        # Where each team's run of columns starts; reduceat cannot sum an
+        # empty run, so teams without results are left out of it
+        self._team_count = team_count
+        self._has_results = np.bincount(team, minlength=team_count) > 0
+        self._starts = np.searchsorted(team, np.flatnonzero(self._has_results))
+
+    def total(self, results):
+        """Each team's total of ``results`` over all its matches."""
+        totals = np.zeros((len(results), self._team_count), dtype=np.int64)
+        if len(self._starts):
+            totals[:, self._has_results] = np.add.reduceat(results, self._starts, axis=1, dtype=np.int64)
+        return totals
+
+    def among(self, results, labels):
+        """Each team's total of ``results`` against the teams level with it only."""
+        # Labels within one simulation are at most a team count apart
+        labels = (labels - labels[:, :1]).astype(np.int16)
+        level = labels[:, self.team] == labels[:, self.opponent]
+        return self.total(np.where(level, results, 0))
+
+
+def rank_positions(table, rules=None):
+    """Each team's position in each simulated league, from a LeagueTable of (simulations x teams) columns.
+
+    The batch counterpart of standings.rank_order: the same rules, the same
+    runs, and teams level on every rule left in the order of ``table``.
+    """
+    simulations, team_count = table.points.shape
+    # Teams level so far share a label; labels keep the simulations apart and in order
+    labels = np.repeat(np.arange(simulations), team_count)
+    levels = simulations
+    for run in rule_runs(rules):
+        if levels == labels.size:
+            break
+        grouped = labels.reshape(simulations, team_count)
+        # The other rules index the table's columns with ``...``: every team
+        keys = [np.broadcast_to(RULES[rule](table, grouped if rule in GROUP_RULES else ...),
+                                (simulations, team_count)).ravel() for rule in run]
+        # lexsort sorts by its last key first
+        order = np.lexsort([-key for key in reversed(keys)] + [labels])
+        ordered = np.stack([labels[order], *(key[order] for key in keys)])
+        labels = np.empty_like(labels)
+        labels[order] = np.concatenate([[0], np.cumsum((ordered[:, 1:] != ordered[:, :-1]).any(axis=0))])
+        levels = labels.max() + 1
+
+    order = np.argsort(labels, kind='stable')
+    positions = np.empty_like(labels)
+    positions[order] = np.tile(np.arange(1, team_count + 1), simulations)
+    return positions.reshape(simulations, team_count)
+
+
+def simulate_standings(matches, teams, simulations=100_000, rules=None, seed=None, workers=None):
+    """Each team's chance of finishing in each position and of qualifying.
+
+    ``matches`` is the fixtures read and ``teams`` the standings read. Returns
+    ``teams``' ``id`` and ``name`` in the current table's order, a column per
+    position (1, 2, ...) and ``qualify`` for the top QUALIFIERS, as fractions.
+    ``workers`` above 1 runs the batches in that many processes.
+    """
+    rule_runs(rules)  # Unknown rules fail here, not in every batch
+    teams = teams.reset_index(drop=True)
+    league = SimulatedLeague(matches, teams)
+    if len(league.team1) == 0:
+        # Nothing left to play: the table is final
+        simulations = 1
+
+    batch = league.batch_size()
+    sizes = [min(batch, simulations - start) for start in range(0, simulations, batch)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if workers and workers > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            counts = sum(pool.map(league.count_positions, sizes, seeds, [rules] * len(sizes)))
+    else:
+        counts = sum(map(league.count_positions, sizes, seeds, [rules] * len(sizes)))
+
+    chances = pd.DataFrame(counts / simulations, columns=range(1, len(teams) + 1))
+    chances['qualify'] = chances.iloc[:, :QUALIFIERS].sum(axis=1)
+    return pd.concat([teams[['id', 'name']], chances], axis=1)
+
+
+if __name__ == '__main__':
+    with read_snapshot() as conn:
+        matches, teams = load_matches(conn), load_teams(conn)
+    simulations = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    chances = simulate_standings(matches, teams, simulations, workers=workers)
+    print(chances.set_index('name').drop(columns='id').map(lambda p: f"{p:.1%}").to_string())
@@ -0,0 +1,133 @@
+"""Live feed of score changes for the ``/events`` stream of api_server.py.
+
+A watcher thread checks the data version a few times a second. When a write
+has committed (a league or knockout score, an import, a reset) it compares
+the new tables with the previous ones and publishes one compact delta:
+
+    {"data_version": 75,
+     "fixtures": {"changed": [<full fixture row>, ...]},
+     "standings": {"changed": [<full standings row>, ...]},
+     "moves": [{"team": "Pune-B", "from": 3, "to": 1}]}
+
+Only the tables that changed appear, each with the rows that changed in full
+and the keys of any rows that were removed; ``winner`` is included when it
+changed. The watcher runs in the API process, so it sees writes made by any
+Streamlit session as well as by other tools.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+
+# Seconds between data version checks; deltas reach clients within this
+POLL_INTERVAL = 0.25
+# Seconds of silence after which a comment line is sent to idle streams
+HEARTBEAT_INTERVAL = 15
+# Deltas kept for clients that reconnect with Last-Event-ID
+HISTORY = 100
+
+# The column identifying a row of each table
+ROW_KEYS = {'standings': 'id', 'fixtures': 'id', 'knockout': 'id'}
+
+
+def encode_event(event, event_id, payload):
+    """Return one Server-Sent Event as bytes."""
+    data = json.dumps(payload, separators=(',', ':'))
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n".encode()
+
+
+def table_delta(old, new):
+    """What changed between two ``{table: rows}`` reads, or None if nothing."""
+    delta = {}
+    for table, key in ROW_KEYS.items():
+        old_rows = {row[key]: row for row in old.get(table, [])}
+        new_rows = {row[key]: row for row in new.get(table, [])}
+        changed = [row for k, row in new_rows.items() if old_rows.get(k) != row]
+        removed = [k for k in old_rows if k not in new_rows]
+        if changed or removed:
+            delta[table] = {'changed': changed}
+            if removed:
+                delta[table]['removed'] = removed
+
+    old_positions = {row['id']: row['position'] for row in old.get('standings', [])}
+    moves = [
+        {'team': row['name'], 'from': old_positions[row['id']], 'to': row['position']}
+        for row in new.get('standings', [])
+        if old_positions.get(row['id'], row['position']) != row['position']
+    ]
+    if moves:
+        delta['moves'] = moves
+    if old.get('winner') != new.get('winner'):
+        delta['winner'] = new.get('winner')
+    return delta or None
+
+
+class ScoreFeed:
+    """Deltas between successive data versions, shared by every stream.
+
+    ``load_state`` returns ``(data version, tables, ...)`` for the current
+    data; the watcher thread starts with the first subscriber.
+    """
+
+    def __init__(self, load_state):
+        self._load_state = load_state
+        self._changed = threading.Condition()
+        # (version a delta starts from, version it brings a client to, encoded event or None)
+        self._events = deque(maxlen=HISTORY)
+        self._version = None
+        self._watcher = None
+
+    def start(self):
+        with self._changed:
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name="score-feed", daemon=True)
+                self._watcher.start()
+
+    def missed_events(self, version):
+        """Return ``(latest version, encoded deltas)`` a client at ``version`` lacks.
+
+        None when the client cannot be caught up with the deltas still kept
+        (too far behind) and needs a fresh snapshot instead.
+        """
+        with self._changed:
+            return self._missed(version)
+
+    def wait_for_events(self, version, timeout):
+        """Like missed_events, but waits up to ``timeout`` seconds for a change."""
+        with self._changed:
+            # The data version only ever goes up; resets keep counting
+            self._changed.wait_for(lambda: self._version is not None and self._version > version, timeout)
+            return self._missed(version)
+
+    def _missed(self, version):
+        if self._version is None or self._version <= version:
+            return version, b''
+        missed = [entry for entry in self._events if entry[1] > version]
+        # Deltas carry whole rows, so one starting before the client's version
+        # is still safe to apply; one starting after it would leave a gap
+        if not missed or missed[0][0] > version:
+            return None
+        return self._version, b''.join(event for _, _, event in missed if event is not None)
+
+    def _watch(self):
+        version = tables = None
+        while True:
+            try:
+                new_version, new_tables = self._load_state()[:2]
+            except sqlite3.Error:
+                time.sleep(POLL_INTERVAL)
+                continue
+
+            if new_version != version:
+                with self._changed:
+                    if version is not None:
+                        # Kept even when nothing shown changed, so clients can
+                        # still step over this version
+                        delta = table_delta(tables, new_tables)
+                        event = delta and encode_event('delta', new_version, {'data_version': new_version, **delta})
+                        self._events.append((version, new_version, event))
+                    self._version = new_version
+                    self._changed.notify_all()
+                version, tables = new_version, new_tables
+            time.sleep(POLL_INTERVAL)
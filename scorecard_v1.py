@@ -1,19 +1,54 @@
 import streamlit as st
 import sqlite3
 import pandas as pd
-from datetime import datetime
-import pytz
 import numpy as np
 import time
+import hashlib
+from functools import partial
+import altair as alt
+
+from asset_cache import image_src
+from team_logos import LOGO_DIR, find_team_logo, logo_index, team_logo_src
+from league_table import render_league_table
+from standings import write_positions
+from tournament_stats import compute_tournament_stats
+from ledger import create_ledger_tables, rebuild_standings, record_result, refresh_head_to_head, refresh_standings
+from team_registry import create_team_tables, rename_team, replace_team_names
+from league_history import LeagueHistory, now_timestamp, timestamp_end_times
+from qualification import QUALIFIERS, simulate_standings
+from fixture_import import apply_fixture_update, create_import_tables, fixture_file_imported, import_fixtures, plan_fixture_update
+from fixture_readers import read_fixture_chunks, read_fixtures, supported_extensions
+from tournament_db import (add_missing_column, at_batch_end, clear_tables, get_data_version, load_knockout_matches,
+                           load_match_history, load_matches, load_teams, read_connection, run_write)
 
 # Configuration
 ADMIN_PASSWORD = st.secrets["ADMIN_PASSWORD"]
 TOURNAMENT_NAME = "IGNITE 2025"
 
-# Initialize database
+# Fragments showing anything derived from league scores; saving scores
+# reruns just these instead of the whole page
+SCORE_FRAGMENTS = ["progress", "scoreboard", "fixtures", "stats"]
+
+# Tab label -> key of the fragment showing it. The open tab is kept in the
+# URL as ?view=<label> and is the only one whose data is loaded.
+VIEWS = {
+    "🏆 Scoreboard": "scoreboard",
+    "📅 Fixtures": "fixtures",
+    "Stats 📊": "stats",
+    "🎯 Knockout Bracket": "knockout",
+}
+
+# Live mode polls the data version every LIVE_MIN_INTERVAL seconds after a
+# change, doubling the wait through quiet spells up to LIVE_MAX_INTERVAL
+LIVE_MIN_INTERVAL = 2
+LIVE_MAX_INTERVAL = 30
+
+# Initialize database (once per server process; the tables outlive reruns)
+@st.cache_resource
 def init_database():
-    conn = sqlite3.connect('tournament.db')
-    cursor = conn.cursor()
+    run_write(lambda conn: _create_tables(conn.cursor()))
+
+def _create_tables(cursor):
     
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS teams (
@@ -22,7 +57,10 @@ def init_database():
             matches_played INTEGER DEFAULT 0,
             goals_for INTEGER DEFAULT 0,
             goals_against INTEGER DEFAULT 0,
-            points INTEGER DEFAULT 0
+            points INTEGER DEFAULT 0,
+            goal_difference INTEGER GENERATED ALWAYS AS (goals_for - goals_against) VIRTUAL,
+            fair_play_points INTEGER NOT NULL DEFAULT 0,
+            position INTEGER
         )
     ''')
     
@@ -30,14 +68,15 @@ def init_database():
         CREATE TABLE IF NOT EXISTS matches (
             id INTEGER PRIMARY KEY,
             match_name TEXT,
-            team1 TEXT,
-            team2 TEXT,
+            team1_id INTEGER REFERENCES teams (id),
+            team2_id INTEGER REFERENCES teams (id),
             score1 INTEGER,
             score2 INTEGER,
             completed BOOLEAN DEFAULT FALSE,
             match_order INTEGER,
             start_time DATETIME,
-            end_time DATETIME
+            end_time DATETIME,
+            version INTEGER NOT NULL DEFAULT 0
         )
     ''')
     
@@ -45,231 +84,229 @@ def init_database():
         CREATE TABLE IF NOT EXISTS knockout_matches (
             id INTEGER PRIMARY KEY,
             match_name TEXT,
-            team1 TEXT,
-            team2 TEXT,
+            team1_id INTEGER REFERENCES teams (id),
+            team2_id INTEGER REFERENCES teams (id),
             score1 INTEGER,
             score2 INTEGER,
             completed BOOLEAN DEFAULT FALSE,
-            stage TEXT
+            stage TEXT,
+            version INTEGER NOT NULL DEFAULT 0
         )
     ''')
-    
-    conn.commit()
-    conn.close()
+
+    # Bumped on every change so concurrent edits can be detected
+    add_missing_column(cursor, 'matches', 'version', 'INTEGER NOT NULL DEFAULT 0')
+    add_missing_column(cursor, 'knockout_matches', 'version', 'INTEGER NOT NULL DEFAULT 0')
+    # Disciplinary points for the fair play tiebreaker; fewer is better
+    add_missing_column(cursor, 'teams', 'fair_play_points', 'INTEGER NOT NULL DEFAULT 0')
+    # ALTER TABLE can only add generated columns as VIRTUAL; the standings
+    # index below stores the value anyway
+    add_missing_column(cursor, 'teams', 'goal_difference', 'INTEGER GENERATED ALWAYS AS (goals_for - goals_against) VIRTUAL')
+    # League position from the tiebreakers, kept up to date on every write
+    add_missing_column(cursor, 'teams', 'position', 'INTEGER')
+
+    # Teams are referred to by ID; databases from before that stored names
+    create_team_tables(cursor)
+    replace_team_names(cursor, 'matches')
+    replace_team_names(cursor, 'knockout_matches')
+
+    # One index per hot read, in its ORDER BY order; the standings one also
+    # covers every column the standings read
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_teams_standings ON teams
+        (position, name, matches_played, goals_for, goals_against, goal_difference, points, fair_play_points)
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_matches_order ON matches (match_order)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_knockout_stage ON knockout_matches (stage)")
+    # Foreign keys, for finding a team's matches
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_matches_team1 ON matches (team1_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_matches_team2 ON matches (team2_id)")
+    # Completed matches in the order they finished, for the standings history
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_matches_finished ON matches (end_time, match_order) WHERE completed")
+
+    # Score history the standings are derived from
+    create_ledger_tables(cursor)
+    create_import_tables(cursor)
+    # Databases from before end times were timestamps
+    timestamp_end_times(cursor)
+
+    # Databases from before head-to-head results and positions were kept
+    refresh_head_to_head(cursor.connection)
+    if cursor.execute("SELECT 1 FROM teams WHERE position IS NULL").fetchone():
+        write_positions(cursor.connection)
 
 # Database functions
+# Reads are shared by every session and only hit SQLite again once a write
+# has bumped the data version.
 def get_teams():
-    conn = sqlite3.connect('tournament.db')
-    df = pd.read_sql_query("SELECT * FROM teams ORDER BY points DESC, (goals_for - goals_against) DESC, goals_for DESC", conn)
-    conn.close()
-    return df
+    return _load_teams(get_data_version())
 
 def get_matches():
-    conn = sqlite3.connect('tournament.db')
-    df = pd.read_sql_query("SELECT * FROM matches ORDER BY match_order", conn)
-    conn.close()
-    return df
+    return _load_matches(get_data_version())
 
 def get_knockout_matches():
-    conn = sqlite3.connect('tournament.db')
-    df = pd.read_sql_query("SELECT * FROM knockout_matches ORDER BY stage", conn)
-    conn.close()
-    return df
+    return _load_knockout_matches(get_data_version())
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def _load_teams(data_version):
+    with read_connection() as conn:
+        # In the order the tiebreakers in standings.py last ranked the teams
+        return load_teams(conn)
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def _load_matches(data_version):
+    with read_connection() as conn:
+        return load_matches(conn)
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def _load_knockout_matches(data_version):
+    with read_connection() as conn:
+        return load_knockout_matches(conn)
+
+# The scoreboard HTML is rebuilt once per data version, not per rerun
+def get_league_table_html():
+    return _render_league_table(get_data_version())
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def _render_league_table(data_version):
+    return render_league_table(_load_teams(data_version))
+
+# The Stats tab's figures, likewise computed once per data version
+def get_tournament_stats():
+    return _load_tournament_stats(get_data_version())
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def _load_tournament_stats(data_version):
+    return compute_tournament_stats(_load_matches(data_version), _load_teams(data_version)['name'])
+
+# The league table after every completed match, and each team's position
+# over time; built once per data version, then any point is a lookup
+def get_league_history():
+    return _load_league_history(get_data_version())
+
+def get_position_history():
+    return _load_position_history(get_data_version())
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def _load_league_history(data_version):
+    with read_connection() as conn:
+        matches = load_match_history(conn)
+    return LeagueHistory(matches, _load_teams(data_version))
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def _load_position_history(data_version):
+    return _load_league_history(data_version).positions()
+
+# Each team's chances of each final position, from playing out the matches
+# left; seeded by the data version so reruns show the same figures. Leagues
+# with many matches left get fewer simulations, so the Stats tab never plays
+# out more than QUALIFICATION_MATCH_BUDGET matches
+QUALIFICATION_SIMULATIONS = 100_000
+QUALIFICATION_MATCH_BUDGET = 3_000_000
+
+def qualification_simulations(remaining):
+    return max(1, min(QUALIFICATION_SIMULATIONS, QUALIFICATION_MATCH_BUDGET // max(remaining, 1)))
+
+def get_qualification_chances(remaining):
+    return _load_qualification_chances(get_data_version(), qualification_simulations(remaining))
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def _load_qualification_chances(data_version, simulations):
+    return simulate_standings(_load_matches(data_version), _load_teams(data_version),
+                              simulations, seed=data_version)
 
 def clear_all_data():
-    conn = sqlite3.connect('tournament.db')
-    cursor = conn.cursor()
-    
-    # Get all table names
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    table_names = [row[0] for row in cursor.fetchall()]
-    
-    # Disable foreign key checks
-    cursor.execute("PRAGMA foreign_keys = OFF;")
-    
-    # Truncate all tables
-    for table in table_names:
-        cursor.execute(f"DELETE FROM {table};")
-    
-    # Re-enable foreign key checks
-    cursor.execute("PRAGMA foreign_keys = ON;")
-    
-    conn.commit()
-    conn.close()
+    run_write(lambda conn: clear_tables(conn.cursor()))
+
+def get_match_state(cursor, table, match_id):
+    cursor.execute(f"SELECT score1, score2, completed, version FROM {table} WHERE id = ?", (match_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return dict(zip(['score1', 'score2', 'completed', 'version'], row))
+
+def update_match_score(match_id, score1, score2, expected_version=None):
+    """Save a league score as a compare-and-swap on the match version.
+
+    With ``expected_version`` the score is only saved if nobody changed the
+    match since that version was read. Returns ``(status, current)``: status
+    is 'updated', 'conflict' or 'missing' and current is the stored match
+    state (scores, completed, version) after the call.
+    """
+    return update_match_scores([(match_id, score1, score2, expected_version)])[0]
 
+def update_match_scores(results):
+    """Save several league scores in one write transaction.
 
+    ``results`` holds ``(match_id, score1, score2, expected_version)`` rows,
+    each saved like update_match_score. Returns their ``(status, current)``
+    pairs in the same order.
+    """
+    current_time = now_timestamp()
 
+    def write(conn):
+        cursor = conn.cursor()
+        return [
+            _save_match_score(conn, cursor, int(match_id), score1, score2, expected_version, current_time)
+            for match_id, score1, score2, expected_version in results
+        ]
 
-def update_knockout_match_score(match_id, score1, score2):
-    conn = sqlite3.connect('tournament.db')
-    cursor = conn.cursor()
-    
-    try:
-        # Update knockout match
-        cursor.execute('''
-            UPDATE knockout_matches SET score1 = ?, score2 = ?, completed = TRUE WHERE id = ?
-        ''', (score1, score2, match_id))
-        
-        # Verify the update worked
-        if cursor.rowcount == 0:
-            conn.close()
-            return False
-        
-        # Get match details to determine winner
-        cursor.execute("SELECT match_name, team1, team2, stage FROM knockout_matches WHERE id = ?", (match_id,))
-        match_data = cursor.fetchone()
-        
-        if match_data:
-            match_name, team1, team2, stage = match_data
-            winner = team1 if score1 > score2 else team2
-            
-            # Update final if this is a semi-final
-            if stage == "semi":
-                cursor.execute("SELECT COUNT(*) FROM knockout_matches WHERE stage = 'semi' AND completed = TRUE")
-                completed_semis = cursor.fetchone()[0]
-                
-                if completed_semis == 2:
-                    # Both semis completed, update final
-                    cursor.execute('''
-                        SELECT team1, team2, score1, score2 FROM knockout_matches 
-                        WHERE stage = 'semi' AND completed = TRUE ORDER BY id
-                    ''')
-                    semi_results = cursor.fetchall()
-                    
-                    finalists = []
-                    for t1, t2, s1, s2 in semi_results:
-                        finalists.append(t1 if s1 > s2 else t2)
-                    
-                    if len(finalists) == 2:
-                        cursor.execute('''
-                            UPDATE knockout_matches SET team1 = ?, team2 = ?, completed = FALSE 
-                            WHERE stage = 'final'
-                        ''', (finalists[0], finalists[1]))
-            
-            # Handle final match completion
-            elif stage == "final":
-                # Create winner record
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS tournament_winner (
-                        id INTEGER PRIMARY KEY,
-                        team_name TEXT,
-                        final_score1 INTEGER,
-                        final_score2 INTEGER,
-                        runner_up TEXT,
-                        date_completed TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
-                
-                # Clear any existing winner (in case of re-run)
-                cursor.execute("DELETE FROM tournament_winner")
-                
-                # Insert tournament winner
-                runner_up = team2 if score1 > score2 else team1
-                cursor.execute('''
-                    INSERT INTO tournament_winner (team_name, final_score1, final_score2, runner_up)
-                    VALUES (?, ?, ?, ?)
-                ''', (winner, score1, score2, runner_up))
-        
-        conn.commit()
-        conn.close()
-        return True
-        
-    except Exception as e:
-        conn.rollback()
-        conn.close()
-        print(f"Error updating knockout match: {e}")
-        return False
-def update_match_score(match_id, score1, score2):
-    conn = sqlite3.connect('tournament.db')
-    cursor = conn.cursor()
-    ist = pytz.timezone('Asia/Kolkata')
-    current_time = datetime.now(ist).strftime('%H:%M')
-    
-    # Get match details
-    cursor.execute("SELECT team1, team2, completed FROM matches WHERE id = ?", (match_id,))
-    match_data = cursor.fetchone()
-    
-    if not match_data:
-        conn.close()
-        return False
-    
-    team1, team2, was_completed = match_data
-    
-    # If match was already completed, reverse the previous scores
-    if was_completed:
-        cursor.execute("SELECT score1, score2 FROM matches WHERE id = ?", (match_id,))
-        old_scores = cursor.fetchone()
-        if old_scores:
-            old_score1, old_score2 = old_scores
-            # Reverse previous stats
-            update_team_stats(cursor, team1, -old_score1, -old_score2, -get_points(old_score1, old_score2), -1)
-            update_team_stats(cursor, team2, -old_score2, -old_score1, -get_points(old_score2, old_score1), -1)
-    
+    return run_write(write)
+
+def _save_match_score(conn, cursor, match_id, score1, score2, expected_version, current_time):
     # Update match
     cursor.execute('''
-        UPDATE matches SET score1 = ?, score2 = ?, completed = TRUE,end_time = ? WHERE id = ?
-    ''', (score1, score2,current_time, match_id))
-    
-    # Update team stats
-    update_team_stats(cursor, team1, score1, score2, get_points(score1, score2), 1)
-    update_team_stats(cursor, team2, score2, score1, get_points(score2, score1), 1)
-    
-    conn.commit()
-    conn.close()
-    return True
+        UPDATE matches SET score1 = ?, score2 = ?, completed = TRUE, end_time = ?, version = version + 1
+        WHERE id = ? AND (? IS NULL OR version = ?)
+    ''', (score1, score2, current_time, match_id, expected_version, expected_version))
 
-def update_team_stats(cursor, team_name, goals_for, goals_against, points, matches_played):
-    cursor.execute('''
-        UPDATE teams SET 
-            goals_for = goals_for + ?,
-            goals_against = goals_against + ?,
-            points = points + ?,
-            matches_played = matches_played + ?
-        WHERE name = ?
-    ''', (goals_for, goals_against, points, matches_played, team_name))
-    
-
-def get_points(score1, score2):
-    if score1 > score2:
-        return 3
-    elif score1 == score2:
-        return 1
-    else:
-        return 0
+    if cursor.rowcount == 0:
+        current = get_match_state(cursor, 'matches', match_id)
+        return ('missing' if current is None else 'conflict'), current
+
+    cursor.execute("SELECT team1_id, team2_id FROM matches WHERE id = ?", (match_id,))
+    team1, team2 = cursor.fetchone()
+
+    # Append the result to the ledger; the standings are re-derived once
+    # for every score committed in the same batch
+    record_result(conn, match_id, team1, team2, score1, score2)
+    at_batch_end(refresh_standings)
+    return 'updated', get_match_state(cursor, 'matches', match_id)
 
 def get_top_4_teams():
     teams_df = get_teams()
-    return teams_df.head(4)
+    return teams_df.head(QUALIFIERS)
 
 def generate_knockout_bracket():
-    conn = sqlite3.connect('tournament.db')
-    cursor = conn.cursor()
-    
-    # Clear existing knockout matches
-    cursor.execute("DELETE FROM knockout_matches")
-    
+    # Read the standings before queueing the write
     top_4 = get_top_4_teams()
-    
-    if len(top_4) >= 4:
-        # Semi-finals: 1st vs 4th, 2nd vs 3rd
-        cursor.execute('''
-            INSERT INTO knockout_matches (match_name, team1, team2, stage,score1, score2, completed)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', ("Semi-Final 1", top_4.iloc[0]['name'], top_4.iloc[3]['name'], "semi", 0, 0, False))
-        
-        cursor.execute('''
-            INSERT INTO knockout_matches (match_name, team1, team2, stage,score1, score2, completed)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', ("Semi-Final 2", top_4.iloc[1]['name'], top_4.iloc[2]['name'], "semi", 0, 0, False))
-        
-        # Final (TBD until semis are completed)
-        cursor.execute('''
-            INSERT INTO knockout_matches (match_name, team1, team2, stage, score1, score2, completed)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', ("Final", "TBD", "TBD", "final",0,0,False))
-    
-    conn.commit()
-    conn.close()
+
+    def write(conn):
+        cursor = conn.cursor()
+
+        # Clear existing knockout matches
+        cursor.execute("DELETE FROM knockout_matches")
+
+        if len(top_4) >= 4:
+            team_ids = [int(team_id) for team_id in top_4['id']]
+            # Semi-finals: 1st vs 4th, 2nd vs 3rd
+            cursor.execute('''
+                INSERT INTO knockout_matches (match_name, team1_id, team2_id, stage,score1, score2, completed)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', ("Semi-Final 1", team_ids[0], team_ids[3], "semi", 0, 0, False))
+
+            cursor.execute('''
+                INSERT INTO knockout_matches (match_name, team1_id, team2_id, stage,score1, score2, completed)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', ("Semi-Final 2", team_ids[1], team_ids[2], "semi", 0, 0, False))
+
+            # Final (TBD, no teams, until semis are completed)
+            cursor.execute('''
+                INSERT INTO knockout_matches (match_name, team1_id, team2_id, stage, score1, score2, completed)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', ("Final", None, None, "final",0,0,False))
+
+    run_write(write)
 
 def get_tournament_progress():
     matches_df = get_matches()
@@ -279,80 +316,56 @@ def get_tournament_progress():
     return (completed / len(matches_df)) * 100
 
 
-def update_final_score(match_id, score1, score2):
-    import sqlite3
-    conn = sqlite3.connect('tournament.db')
-    cursor = conn.cursor()
+def update_knockout_match_score(match_id, score1, score2, expected_version=None):
+    """Save a knockout score; same compare-and-swap contract as update_match_score."""
+    match_id = int(match_id)
 
-    cursor.execute(
-        "UPDATE knockout_matches SET score1 = ?, score2 = ?, completed = 1 WHERE id = 3;",
-        (score1, score2)
-    )
-    conn.commit()
-    conn.close()
-    return True
+    def write(conn):
+        cursor = conn.cursor()
 
-def update_knockout_match_score(match_id, score1, score2):
-    conn = sqlite3.connect('tournament.db')
-    cursor = conn.cursor()
-    
-    # Update knockout match
-    cursor.execute('''
-        UPDATE knockout_matches SET score1 = ?, score2 = ?, completed = TRUE WHERE id = ?
-    ''', (score1, score2, match_id))
-    
-    # Get match details to determine winner
-    cursor.execute("SELECT match_name, team1, team2, stage FROM knockout_matches WHERE id = ?", (match_id,))
-    match_data = cursor.fetchone()
-    
-    if match_data:
-        match_name, team1, team2, stage = match_data
-        winner = team1 if score1 > score2 else team2
-        
-        # Update final if this is a semi-final
-        if stage == "semi":
-            cursor.execute("SELECT COUNT(*) FROM knockout_matches WHERE stage = 'semi' AND completed = TRUE")
-            completed_semis = cursor.fetchone()[0]
-            
-            if completed_semis == 2:
-                # Both semis completed, update final
-                cursor.execute('''
-                    SELECT team1, team2, score1, score2 FROM knockout_matches 
-                    WHERE stage = 'semi' AND completed = TRUE
-                ''')
-                semi_results = cursor.fetchall()
-                
-                finalists = []
-                for team1, team2, s1, s2 in semi_results:
-                    finalists.append(team1 if s1 > s2 else team2)
-                
-                if len(finalists) == 2:
+        # Update knockout match
+        cursor.execute('''
+            UPDATE knockout_matches SET score1 = ?, score2 = ?, completed = TRUE, version = version + 1
+            WHERE id = ? AND (? IS NULL OR version = ?)
+        ''', (score1, score2, match_id, expected_version, expected_version))
+
+        if cursor.rowcount == 0:
+            current = get_match_state(cursor, 'knockout_matches', match_id)
+            return ('missing' if current is None else 'conflict'), current
+
+        # Get match details to determine winner
+        cursor.execute("SELECT match_name, team1_id, team2_id, stage FROM knockout_matches WHERE id = ?", (match_id,))
+        match_data = cursor.fetchone()
+
+        if match_data:
+            match_name, team1, team2, stage = match_data
+
+            # Update final if this is a semi-final. The final needs nothing
+            # more: the champion is read from its own score
+            if stage == "semi":
+                cursor.execute("SELECT COUNT(*) FROM knockout_matches WHERE stage = 'semi' AND completed = TRUE")
+                completed_semis = cursor.fetchone()[0]
+
+                if completed_semis == 2:
+                    # Both semis completed, update final
                     cursor.execute('''
-                        UPDATE knockout_matches SET team1 = ?, team2 = ? WHERE stage = 'final'
-                    ''', (finalists[0], finalists[1]))
-        # Handle final match completion - insert winner into tournament_winner table
-        elif stage == "final":
-            # Create winner record
-            cursor.execute('''
-                UPDATE knockout_matches SET team1 = ?, team2 = ? WHERE stage = 'final'
-                )
-            ''',(finalists[0], finalists[1]))
-            
-            # # Clear any existing winner (in case of re-run)
-            # cursor.execute("DELETE FROM tournament_winner")
-            
-            # # Insert tournament winner
-            # runner_up = team2 if score1 > score2 else team1
-            # cursor.execute('''
-            #     INSERT INTO tournament_winner (team_name, final_score1, final_score2, runner_up)
-            #     VALUES (?, ?, ?, ?)
-            # ''', (winner, score1, score2, runner_up))
+                        SELECT team1_id, team2_id, score1, score2 FROM knockout_matches
+                        WHERE stage = 'semi' AND completed = TRUE
+                    ''')
+                    semi_results = cursor.fetchall()
 
-    
-    conn.commit()
-    conn.close()
-    return True
+                    finalists = []
+                    for team1, team2, s1, s2 in semi_results:
+                        finalists.append(team1 if s1 > s2 else team2)
+
+                    if len(finalists) == 2:
+                        cursor.execute('''
+                            UPDATE knockout_matches SET team1_id = ?, team2_id = ?, version = version + 1 WHERE stage = 'final'
+                        ''', (finalists[0], finalists[1]))
 
+        return 'updated', get_match_state(cursor, 'knockout_matches', match_id)
+
+    return run_write(write)
 
 # Streamlit app
 def main():
@@ -645,29 +658,28 @@ def main():
 }
 </style>
 """, unsafe_allow_html=True)
-    import base64
-    def img_to_base64(image_path):
-        with open(image_path, "rb") as img_file:
-            return base64.b64encode(img_file.read()).decode()
+    # Images are loaded and scaled to their slot once per process, then
+    # referenced by static URL (or inlined when static serving is off)
     #st.markdown(f'<div class="main-header floating-animation">⚽🔥 {TOURNAMENT_NAME} 🔥⚽</div>', unsafe_allow_html=True)
     image_path = "assets/logo.png"  # Update this path to your image location
-    img_base64 = img_to_base64(image_path)
+    img_src = image_src(image_path)
 
 
+    # Sponsor banners are 60px high
     sponsor_path = "assets/ASKGEO.jpg"
-    sponsor = img_to_base64(sponsor_path)
+    sponsor = image_src(sponsor_path, max_height=60)
 
     sponsor_path_2 = "assets/sponsor_2.jpg"
-    sponsor_2 = img_to_base64(sponsor_path_2)
+    sponsor_2 = image_src(sponsor_path_2, max_height=60)
     
     sponsor_path_3 = "assets/sponsor_3.jpg"
-    sponsor_3 = img_to_base64(sponsor_path_3)
+    sponsor_3 = image_src(sponsor_path_3, max_height=60)
 
     
     # Main Header with Logo
     st.markdown(f'''
 <div class="main-header floating-animation">
-    <img src="data:image/png;base64,{img_base64}" alt="Tournament Logo"
+    <img src="{img_src}" alt="Tournament Logo"
          style="width: 90%; height: auto; display: block; margin: 0 auto; object-fit: contain;">
 </div>
 ''', unsafe_allow_html=True)
@@ -676,27 +688,26 @@ def main():
     st.markdown(f'''
 <div style="display: flex; justify-content: center; gap: 2%; margin-top: -1.2rem; margin-bottom: 1.5rem;">
     <a href="https://www.askgeo.in" target="_blank" class="floating-animation" style="width: 44%; padding: 5px; border: 3px solid orange; border-radius: 10px; background-color: black; box-shadow: 0 0 15px red; text-align: center; text-decoration: none;">
-        <img src="data:image/png;base64,{sponsor}" style="width: 100%; height: 60px; object-fit: contain;">
+        <img src="{sponsor}" style="width: 100%; height: 60px; object-fit: contain;">
     </a>
     <a href="https://www.shreesaidevelopers.in/" target="_blank" class="floating-animation" style="width: 44%; padding: 5px; border: 3px solid orange; border-radius: 10px; background-color: black; box-shadow: 0 0 15px red; text-align: center; text-decoration: none;">
-        <img src="data:image/png;base64,{sponsor_2}" style="width: 100%; height: 60px; object-fit: contain;">
+        <img src="{sponsor_2}" style="width: 100%; height: 60px; object-fit: contain;">
     </a>
     <a href="https://grandcoolengg.com/" target="_blank" class="floating-animation" style="width: 44%; padding: 5px; border: 3px solid orange; border-radius: 10px; background-color: black; box-shadow: 0 0 15px red; text-align: center; text-decoration: none;">
-        <img src="data:image/png;base64,{sponsor_3}" style="width: 100%; height: 60px; object-fit: contain;">
+        <img src="{sponsor_3}" style="width: 100%; height: 60px; object-fit: contain;">
     </a>
 </div>
 ''', unsafe_allow_html=True)
     # Progress indicator
-    progress = get_tournament_progress()
-    st.markdown('<div class="progress-bar">', unsafe_allow_html=True)
-    st.subheader("🏆 Tournament Progress")
-    st.progress(progress / 100)
-    st.write(f"**{progress:.1f}% Complete**")
-    st.markdown('</div>', unsafe_allow_html=True)
+    show_progress()
     
     # Sidebar
     st.sidebar.title("🏆 Tournament Menu")
-    
+    st.sidebar.toggle("📺 Live Mode", key="live", bind="query-params",
+                      help="Refresh by itself whenever a score is saved, e.g. on a big screen")
+    if st.session_state.live:
+        with st.sidebar:
+            show_live_updates()
     
     # Admin login
     if 'admin_logged_in' not in st.session_state:
@@ -718,38 +729,36 @@ def main():
         if st.sidebar.button("Logout", type="secondary"):
             st.session_state.admin_logged_in = False
             st.rerun()
-    tab1, tab2, tab3,tab4 = st.tabs(["🏆 Scoreboard", "📅 Fixtures","Stats 📊", "🎯 Knockout Bracket"])
+    tab1, tab2, tab3, tab4 = st.tabs(list(VIEWS), key="view", bind="query-params")
 
     # Navigation
     st.sidebar.markdown("---")
     
     # Admin file upload
     if st.session_state.admin_logged_in:
-        st.sidebar.markdown("---")
-        st.sidebar.subheader("📁 Upload Fixtures")
-        uploaded_file = st.sidebar.file_uploader("Choose Excel file", type=['xlsx', 'xls'])
-        if uploaded_file is not None:
-            success, message = import_fixtures_from_excel(uploaded_file)
-            if success:
-                st.sidebar.success(message)
-            else:
-                st.sidebar.error(message)
-                st.session_state.file_processed = False
+        admin_upload_fixtures()
     if st.session_state.admin_logged_in:
+        admin_rebuild_standings()
+        admin_rename_team()
         admin_clear_all_data()
     
-    with tab1:
-        show_scoreboard()
-    with tab2:  
-        show_fixtures()
-    with tab3:
-        show_stats()
-    with tab4:
-        show_knockout_bracket()
+    # Only the open tab is rendered; switching tabs reruns the page
+    if tab1.open:
+        with tab1:
+            show_scoreboard()
+    if tab2.open:
+        with tab2:
+            show_fixtures()
+    if tab3.open:
+        with tab3:
+            show_stats()
+    if tab4.open:
+        with tab4:
+            show_knockout_bracket()
 
     # Footer with logo and host text
     footer_logo_path = "assets/MGOCSM.png"  # Update if different from the header
-    footer_logo_base64 = img_to_base64(footer_logo_path)
+    footer_logo_src = image_src(footer_logo_path, 75, 75, cover=True)
 
     st.markdown(f"""
     <style>
@@ -784,12 +793,53 @@ def main():
 
     <div class="footer-container">
         <a href="https://www.instagram.com/mgocsm_dehuroad?igsh=dmN6c3ZneDN3eW5i" target="_blank">
-        <img class="footer-logo" src="data:image/png;base64,{footer_logo_base64}" alt="Footer Logo" /></a>
+        <img class="footer-logo" src="{footer_logo_src}" alt="Footer Logo" /></a>
         <div class="footer-text">Hosted by MGOCSM Dehuroad</div>
     </div>
     """, unsafe_allow_html=True)
 
 
+@st.fragment(key="progress")
+def show_progress():
+    progress = get_tournament_progress()
+    st.markdown('<div class="progress-bar">', unsafe_allow_html=True)
+    st.subheader("🏆 Tournament Progress")
+    st.progress(progress / 100)
+    st.write(f"**{progress:.1f}% Complete**")
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def show_live_updates():
+    data_version = get_data_version()
+    if st.session_state.get('live_version') != data_version:
+        st.session_state.live_version = data_version
+        st.session_state.live_changed_at = time.time()
+    # The polling interval is fixed when the fragment is declared, so it is
+    # declared again on every full run
+    interval = live_interval()
+    st.fragment(_watch_data_version, run_every=interval)(interval)
+
+def live_interval():
+    """Seconds between checks: short after a change, doubling while nothing happens."""
+    quiet_for = time.time() - st.session_state.live_changed_at
+    interval = LIVE_MIN_INTERVAL
+    while interval < LIVE_MAX_INTERVAL and quiet_for >= 4 * interval:
+        interval *= 2
+    return min(interval, LIVE_MAX_INTERVAL)
+
+def _watch_data_version(interval):
+    # Between goals a check is this one query; the page only reruns when the
+    # data changed, or to poll less often
+    if get_data_version() != st.session_state.live_version or live_interval() != interval:
+        st.rerun()
+    st.caption(f"🔴 Live · checking every {interval}s")
+
+def shown_score_fragments():
+    """The SCORE_FRAGMENTS on the page; st.rerun() refuses keys of tabs not rendered."""
+    open_view = VIEWS.get(st.session_state.get('view'), "scoreboard")
+    return [key for key in SCORE_FRAGMENTS if key in ("progress", open_view)]
+
+# Each tab is a fragment: its widgets rerun only that tab
+@st.fragment(key="scoreboard")
 def show_scoreboard():
     col1, col2 = st.columns([3, 1])
     
@@ -799,147 +849,8 @@ def show_scoreboard():
         teams_df = get_teams()
         
         if not teams_df.empty:
-            for i, (_, team) in enumerate(teams_df.iterrows(), 1):
-                gd = team['goals_for'] - team['goals_against']
-                
-                # Football-themed position indicators
-                if i == 1:
-                    position_indicator = "👑"  # Crown for champion
-                    bg_color = "#FFD700"
-                    border_color = "#FFA000"
-                elif i == 2:
-                    position_indicator = "🥈"  # Silver medal
-                    bg_color = "#E8F5E8"
-                    border_color = "#4CAF50"
-                elif i == 3:
-                    position_indicator = "🥉"  # Bronze medal
-                    bg_color = "#E8F5E8"
-                    border_color = "#4CAF50"
-                elif i == 4:
-                    position_indicator = "⚡"  # Lightning for European competition
-                    bg_color = "#FFF3E0"
-                    border_color = "#FF9800"
-                elif i <= 6:
-                    position_indicator = "🏆"  # Trophy for European spots
-                    bg_color = "#FFF3E0"
-                    border_color = "#FF9800"
-                elif i <= len(teams_df) - 3:
-                    position_indicator = "⚽"  # Football for safe positions
-                    bg_color = "#F5F5F5"
-                    border_color = "#9E9E9E"
-                else:
-                    position_indicator = "🔻"  # Red triangle for relegation zone
-                    bg_color = "#FFEBEE"
-                    border_color = "#F44336"
-                
-                # Goal difference color logic
-                gd_color = 'green' if gd > 0 else 'red' if gd < 0 else 'orange'
-                
-                st.markdown(f"""
-                <style>
-                .scoreboard-tile-{i} {{
-                    padding: 12px;
-                    margin-bottom: 8px;
-                    background: {bg_color}; 
-                    border-radius: 10px;
-                    border-left: 6px solid {border_color};
-                    box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
-                }}
-                
-                .scoreboard-content-{i} {{
-                    display: flex;
-                    flex-direction: column;
-                }}
-                
-                @media (min-width: 600px) {{
-                    .scoreboard-content-{i} {{
-                        flex-direction: row;
-                        justify-content: space-between;
-                        align-items: center;
-                    }}
-                }}
-                
-                .team-info-{i} {{
-                    display: flex;
-                    align-items: center;
-                    margin-bottom: 8px;
-                }}
-                
-                @media (min-width: 600px) {{
-                    .team-info-{i} {{
-                        margin-bottom: 0;
-                    }}
-                }}
-                
-                .team-position-{i} {{
-                    font-weight: bold;
-                    font-size: 1rem;
-                    margin-right: 8px;
-                    color: #000000;
-                }}
-                
-                .team-name-{i} {{
-                    font-size: 1rem;
-                    font-weight: 600;
-                    color: #000;
-                }}
-                
-                .team-stats-{i} {{
-                    display: flex;
-                    justify-content: space-between;
-                    gap: 1rem;
-                }}
-                
-                .stat-{i} {{
-                    text-align: center;
-                }}
-                
-                .stat-label-{i} {{
-                    font-size: 0.7rem;
-                    color: #000000;
-                }}
-                
-                .stat-value-{i} {{
-                    font-size: 1rem;
-                    font-weight: 600;
-                }}
-                
-                .stat-gd-{i} {{
-                    color: {gd_color};
-                }}
-                </style>
-                
-                <div class="scoreboard-tile-{i}">
-                    <div class="scoreboard-content-{i}">
-                        <div class="team-info-{i}">
-                            <span class="team-position-{i}">{i}</span>
-                            <span class="team-name-{i}">{position_indicator} {team['name']}</span>
-                        </div>
-                        <div class="team-stats-{i}">
-                            <div class="stat-{i}">
-                                <div class="stat-label-{i}">Played</div>
-                                <div class="stat-value-{i}" style="color:#000000;">{team['matches_played']}</div>
-                            </div>
-                            <div class="stat-{i}">
-                                <div class="stat-label-{i}">GF</div>
-                                <div class="stat-value-{i}" style="color:#000000;">{team['goals_for']}</div>
-                            </div>
-                            <div class="stat-{i}">
-                                <div class="stat-label-{i}">GA</div>
-                                <div class="stat-value-{i}" style="color:#000000;">{team['goals_against']}</div>
-                            </div>
-                            <div class="stat-{i}">
-                                <div class="stat-label-{i}">GD</div>
-                                <div class="stat-value-{i} stat-gd-{i}">{gd:+d}</div>
-                            </div>
-                            <div class="stat-{i}">
-                                <div class="stat-label-{i}">Points</div>
-                                <div class="stat-value-{i}" style="color:#1B5E20;">{team['points']}</div>
-                            </div>
-                        </div>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
+            # One stylesheet and one row template, sent as a single element
+            st.markdown(get_league_table_html(), unsafe_allow_html=True)
         else:
             st.info("No teams available. Please upload fixtures first.")
     
@@ -987,6 +898,135 @@ def show_scoreboard():
     #         </div>
     #         ''', unsafe_allow_html=True)
 
+# Concurrent score edits: each form remembers the match version it was
+# filled from, and a save that lost the race offers to keep or take over
+def show_score_conflict(score_keys, version_key, save):
+    current = st.session_state.get(f"conflict_{version_key}")
+    if current is None:
+        return
+    theirs = f"{int(current['score1'])} - {int(current['score2'])}" if current['completed'] else "no score"
+    st.warning(f"⚠️ Someone else saved this match first ({theirs}). Keep your score or take theirs?")
+    col_a, col_b = st.columns(2)
+    with col_a:
+        st.button("Keep Mine", key=f"keep_{version_key}", type="primary", width="stretch",
+                  on_click=_keep_my_score, args=(score_keys, version_key, save))
+    with col_b:
+        st.button("Take Theirs", key=f"take_{version_key}", width="stretch",
+                  on_click=_take_their_score, args=(score_keys, version_key))
+
+def save_score(score_keys, version_key, save):
+    status, current = save(st.session_state[score_keys[0]], st.session_state[score_keys[1]],
+                           st.session_state.get(version_key))
+    if status == 'conflict':
+        st.session_state[f"conflict_{version_key}"] = current
+    else:
+        # Re-read the version from the saved match on the next run
+        st.session_state.pop(version_key, None)
+    return status
+
+def _keep_my_score(score_keys, version_key, save):
+    # Retry against the version that won, overwriting it
+    current = st.session_state.pop(f"conflict_{version_key}")
+    st.session_state[version_key] = current['version']
+    save_score(score_keys, version_key, save)
+
+def _take_their_score(score_keys, version_key):
+    current = st.session_state.pop(f"conflict_{version_key}")
+    st.session_state[score_keys[0]] = int(current['score1']) if current['completed'] else 0
+    st.session_state[score_keys[1]] = int(current['score2']) if current['completed'] else 0
+    st.session_state[version_key] = current['version']
+
+# Admin results grid: every score edited in it is saved in one transaction
+def show_results_grid(matches_df):
+    generation = st.session_state.setdefault('results_grid_generation', 0)
+    grid_key = f"results_grid_{generation}"
+
+    # Keep editing the fixture list as it was when the first cell changed,
+    # so the versions checked on save are the ones the admin saw
+    if 'results_grid_base' not in st.session_state or not st.session_state.get(grid_key, {}).get('edited_rows'):
+        st.session_state.results_grid_base = matches_df
+    base = st.session_state.results_grid_base
+
+    grid = base[['match_name', 'team1', 'team2', 'start_time', 'score1', 'score2']].astype({'score1': 'Int64', 'score2': 'Int64'})
+    edited = st.data_editor(
+        grid,
+        key=grid_key,
+        hide_index=True,
+        width="stretch",
+        disabled=['match_name', 'team1', 'team2', 'start_time'],
+        column_config={
+            'match_name': "Match",
+            'team1': "🏠 Team 1",
+            'team2': "🚌 Team 2",
+            'start_time': "🕒 Start",
+            'score1': st.column_config.NumberColumn("Goals 1", min_value=0, max_value=20, step=1),
+            'score2': st.column_config.NumberColumn("Goals 2", min_value=0, max_value=20, step=1),
+        },
+    )
+
+    # A row is saved once both scores are filled in and one of them changed
+    filled = edited['score1'].notna() & edited['score2'].notna()
+    differs = (edited['score1'] != grid['score1']).fillna(True) | (edited['score2'] != grid['score2']).fillna(True)
+    changed = base[filled & differs]
+    half_filled = (edited['score1'].notna() != edited['score2'].notna()).sum()
+    if half_filled:
+        st.caption(f"{half_filled} match(es) need both scores before they can be saved.")
+
+    entered = [
+        (int(match['id']), int(edited.at[i, 'score1']), int(edited.at[i, 'score2']), int(match['version']))
+        for i, match in changed.iterrows()
+    ]
+    st.button(f"💾 Save {len(changed)} Result(s)", type="primary", disabled=changed.empty, width="stretch",
+              on_click=_save_results_grid, args=(entered, list(changed['match_name'])))
+
+    if 'results_grid_message' in st.session_state:
+        st.success(st.session_state.pop('results_grid_message'))
+    show_grid_conflicts()
+
+def _save_results_grid(entered, match_names):
+    outcomes = update_match_scores(entered)
+    saved = sum(status == 'updated' for status, _ in outcomes)
+    st.session_state.results_grid_conflicts = [
+        {'id': row[0], 'match_name': match_name, 'mine': row[1:3], 'current': current}
+        for row, match_name, (status, current) in zip(entered, match_names, outcomes)
+        if status == 'conflict'
+    ]
+    st.session_state.results_grid_message = f"Saved {saved} result(s)!"
+    # Start over from the saved data
+    st.session_state.results_grid_generation += 1
+    st.session_state.pop('results_grid_base', None)
+    st.rerun(shown_score_fragments())
+
+def show_grid_conflicts():
+    conflicts = st.session_state.get('results_grid_conflicts')
+    if not conflicts:
+        return
+    lines = []
+    for conflict in conflicts:
+        current = conflict['current']
+        theirs = f"{int(current['score1'])} - {int(current['score2'])}" if current['completed'] else "no score"
+        lines.append(f"- **{conflict['match_name']}**: you entered {conflict['mine'][0]} - {conflict['mine'][1]}, saved meanwhile as {theirs}")
+    st.warning("⚠️ Someone else saved these matches first; the grid shows their scores.\n" + "\n".join(lines))
+    col_a, col_b = st.columns(2)
+    with col_a:
+        st.button("Overwrite With Mine", key="grid_keep_mine", type="primary", width="stretch",
+                  on_click=_overwrite_grid_conflicts)
+    with col_b:
+        st.button("Keep Theirs", key="grid_keep_theirs", width="stretch",
+                  on_click=st.session_state.pop, args=('results_grid_conflicts',))
+
+def _overwrite_grid_conflicts():
+    conflicts = st.session_state.pop('results_grid_conflicts')
+    outcomes = update_match_scores([(c['id'], *c['mine'], c['current']['version']) for c in conflicts])
+    # Anything that changed yet again is offered once more
+    st.session_state.results_grid_conflicts = [
+        {**conflict, 'current': current}
+        for conflict, (status, current) in zip(conflicts, outcomes)
+        if status == 'conflict'
+    ]
+    st.rerun(shown_score_fragments())
+
+@st.fragment(key="fixtures")
 def show_fixtures():
     #st.markdown('<div class="tournament-container">', unsafe_allow_html=True)
     st.subheader("📅 Match Fixtures")
@@ -999,41 +1039,8 @@ def show_fixtures():
         return
     
     if st.session_state.admin_logged_in:
-        st.info("🔧 Admin Mode: Update match scores")
-        
-        for _, match in matches_df.iterrows():
-            status = "✅ Completed" if match['completed'] else "⏳ Pending"
-            start_time = match['start_time'] if pd.notna(match['start_time']) else "TBD"
-            end_time = pd.to_datetime(match['end_time']).strftime('%H:%M') if pd.notna(match['end_time']) else "TBD"
-            
-            
-            
-            with st.expander(f"{match['match_name']}: {match['team1']} vs {match['team2']} - {status} (🕒 {pd.to_datetime(match['start_time']).strftime('%H:%M')} to {end_time})",
-                           expanded=not match['completed']):
-                
-                # Mobile-optimized layout: Stack vertically instead of side-by-side
-                st.markdown(f"**🏠 {match['team1']}**")
-                score1 = st.number_input("Goals", 
-                                       min_value=0, max_value=20, 
-                                       value=int(match['score1']) if match['completed'] else 0,
-                                       key=f"score1_{match['id']}")
-                
-                st.markdown("**VS**")
-                
-                st.markdown(f"**🚌 {match['team2']}**")
-                score2 = st.number_input("Goals", 
-                                       min_value=0, max_value=20, 
-                                       value=int(match['score2']) if match['completed'] else 0,
-                                       key=f"score2_{match['id']}")
-                
-                if st.button("Update Match", key=f"update_{match['id']}", type="primary", use_container_width=True):
-                    if update_match_score(match['id'], score1, score2):
-                        st.success("Updated!")
-                        st.rerun()
-                
-                if match['completed']:
-                    winner = match['team1'] if match['score1'] > match['score2'] else match['team2'] if match['score2'] > match['score1'] else "Draw"
-                    st.success(f"🏆 Final: {match['team1']} {int(match['score1'])} - {int(match['score2'])} {match['team2']} ({winner})")
+        st.info("🔧 Admin Mode: Enter the results in the grid, then save them together")
+        show_results_grid(matches_df)
     else:
         # Read-only view - Mobile optimized
         completed_matches = matches_df[matches_df['completed'] == True]
@@ -1090,113 +1097,36 @@ def show_fixtures():
                 ''', unsafe_allow_html=True)
     
     st.markdown('</div>', unsafe_allow_html=True)
-import os
-import base64
 # Complete the missing show_knockout_bracket function
 
 import os
-import base64
 import logging
-from pathlib import Path
 import streamlit as st
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_team_logo_base64(team_name):
-    """
-    Get team logo as base64 string with comprehensive logging and fallback options.
-    """
-    # Get the current working directory and script directory
-    current_dir = os.getcwd()
-    script_dir = Path(__file__).parent if '__file__' in globals() else Path('.')
-    
-    logger.info(f"Current working directory: {current_dir}")
-    logger.info(f"Script directory: {script_dir}")
-    
-    # Multiple possible paths to check
-    possible_paths = [
-        # Relative to current working directory
-        Path(current_dir) / "team_logo" / f"{team_name}.png",
-        Path(current_dir) / "team_logo" / f"{team_name}.jpg",
-        # Relative to script directory
-        script_dir / "team_logo" / f"{team_name}.png",
-        script_dir / "team_logo" / f"{team_name}.jpg",
-        # Direct relative paths
-        Path("team_logo") / f"{team_name}.png",
-        Path("team_logo") / f"{team_name}.jpg",
-        # Absolute paths (if team_logo is in root)
-        Path(".") / "team_logo" / f"{team_name}.png",
-        Path(".") / "team_logo" / f"{team_name}.jpg",
-    ]
-    
-    logger.info(f"Searching for logo for team: {team_name}")
-    
-    # List all files in team_logo directory if it exists
-    team_logo_dirs = [
-        Path(current_dir) / "team_logo",
-        script_dir / "team_logo",
-        Path("team_logo"),
-        Path(".") / "team_logo"
-    ]
-    
-    for logo_dir in team_logo_dirs:
-        if logo_dir.exists():
-            logger.info(f"Found team_logo directory: {logo_dir}")
-            try:
-                files = list(logo_dir.glob("*"))
-                logger.info(f"Files in {logo_dir}: {[f.name for f in files]}")
-            except Exception as e:
-                logger.error(f"Error listing files in {logo_dir}: {e}")
-        else:
-            logger.info(f"Directory does not exist: {logo_dir}")
-    
-    # Try each possible path
-    for path in possible_paths:
-        logger.info(f"Checking path: {path}")
-        try:
-            if path.exists() and path.is_file():
-                logger.info(f"Found logo at: {path}")
-                with open(path, "rb") as f:
-                    encoded = base64.b64encode(f.read()).decode()
-                    return f'<img src="data:image/png;base64,{encoded}" class="team-logo">'
-            else:
-                logger.info(f"Path does not exist or is not a file: {path}")
-        except Exception as e:
-            logger.error(f"Error reading {path}: {e}")
-    
-    # If no logo found, return placeholder
-    logger.warning(f"No logo found for team: {team_name}")
-    return '<div class="placeholder-logo">🏆</div>'
+def team_logo_html(team_name):
+    """Team logo as an <img> tag for the bracket, or a placeholder if it has none."""
+    src = team_logo_src(team_name, 100)
+    if src is None:
+        return '<div class="placeholder-logo">🏆</div>'
+    return f'<img src="{src}" class="team-logo">'
 
+@st.fragment(key="knockout")
 def show_knockout_bracket():
     st.subheader("🎯 Knockout Bracket")
     
     # Add debug information for admins
     if st.session_state.get('admin_logged_in', False):
         with st.expander("🔍 Debug Information"):
-            st.write("**Current Working Directory:**", os.getcwd())
-            st.write("**Script Directory:**", str(Path(__file__).parent if '__file__' in globals() else "Unknown"))
-            
-            # Check if team_logo directory exists
-            possible_dirs = [
-                Path(os.getcwd()) / "team_logo",
-                Path("team_logo"),
-                Path(".") / "team_logo"
-            ]
-            
-            for dir_path in possible_dirs:
-                if dir_path.exists():
-                    st.write(f"**Found team_logo at:** {dir_path}")
-                    try:
-                        files = list(dir_path.glob("*"))
-                        st.write(f"**Files:** {[f.name for f in files]}")
-                    except Exception as e:
-                        st.write(f"**Error listing files:** {e}")
-                    break
+            st.write("**Logo Folder:**", LOGO_DIR)
+            logos = logo_index()
+            if logos:
+                st.write("**Indexed Logos:**", {name: os.path.basename(path) for name, path in logos.items()})
             else:
-                st.warning("team_logo directory not found in any expected location")
+                st.warning("No team logos found in the logo folder")
     
     # Streamlined CSS with horizontal layout
     st.markdown("""
@@ -1376,7 +1306,7 @@ def show_knockout_bracket():
         if st.button("🔄 Generate Knockout Bracket", type="primary"):
             generate_knockout_bracket()
             st.success("Knockout bracket generated!")
-            st.rerun()
+            st.rerun(scope="fragment")
     
     knockout_df = get_knockout_matches()
     if knockout_df.empty:
@@ -1394,8 +1324,8 @@ def show_knockout_bracket():
         status = "✅" if match['completed'] else "⏳"
         
         # Get team logos using the new function
-        team1_logo = get_team_logo_base64(match['team1'])
-        team2_logo = get_team_logo_base64(match['team2'])
+        team1_logo = team_logo_html(match['team1'])
+        team2_logo = team_logo_html(match['team2'])
         
         # Single markdown with complete HTML structure
         st.markdown(f'''
@@ -1419,19 +1349,27 @@ def show_knockout_bracket():
         </div>
         ''', unsafe_allow_html=True)
         
-        # Admin score update
-        if st.session_state.get('admin_logged_in', False) and not match['completed']:
+        # Admin score update; a form already open stays open when someone
+        # else saves the match, so its save reports the conflict
+        if st.session_state.get('admin_logged_in', False) and (
+                not match['completed'] or f"ko_version_{match['id']}" in st.session_state):
             with st.expander(f"📝 Update SF{i+1} Score"):
+                score_keys = (f"ko_s1_{match['id']}", f"ko_s2_{match['id']}")
+                version_key = f"ko_version_{match['id']}"
+                st.session_state.setdefault(version_key, int(match['version']))
+
                 col_a, col_b = st.columns(2)
                 with col_a:
-                    s1 = st.number_input(f"{match['team1']} Goals", 0, 20, key=f"ko_s1_{match['id']}")
+                    st.number_input(f"{match['team1']} Goals", 0, 20, key=f"ko_s1_{match['id']}")
                 with col_b:
-                    s2 = st.number_input(f"{match['team2']} Goals", 0, 20, key=f"ko_s2_{match['id']}")
+                    st.number_input(f"{match['team2']} Goals", 0, 20, key=f"ko_s2_{match['id']}")
                 
+                save = partial(update_knockout_match_score, match['id'])
                 if st.button("Update Score", key=f"ko_update_{match['id']}", type="primary"):
-                    update_knockout_match_score(match['id'], s1, s2)
-                    st.success("Score updated!")
-                    st.rerun()
+                    if save_score(score_keys, version_key, save) == 'updated':
+                        st.success("Score updated!")
+                        st.rerun(scope="fragment")
+                show_score_conflict(score_keys, version_key, save)
     
     st.markdown('</div>', unsafe_allow_html=True)  # Close semi-finals
     
@@ -1454,8 +1392,8 @@ def show_knockout_bracket():
             st.markdown('<div style="text-align: center; color: white; padding: 2rem;">Awaiting Semi-Final Results</div>', unsafe_allow_html=True)
         else:
             # Get final team logos using the new function
-            final_team1_logo = get_team_logo_base64(final_match['team1'])
-            final_team2_logo = get_team_logo_base64(final_match['team2'])
+            final_team1_logo = team_logo_html(final_match['team1'])
+            final_team2_logo = team_logo_html(final_match['team2'])
             
             # Single markdown for final
             st.markdown(f'''
@@ -1494,22 +1432,25 @@ def show_knockout_bracket():
         #             st.success("Final score updated!")
         #             st.rerun()
     
-        if st.session_state.get('admin_logged_in', False) and not final_match['completed'] and final_match['team1'] != 'TBD':
+        if st.session_state.get('admin_logged_in', False) and final_match['team1'] != 'TBD' and (
+                not final_match['completed'] or f"ko_version_{final_match['id']}" in st.session_state):
             with st.expander("📝 Update Final Score"):
+                score_keys = (f"final_s1_{final_match['id']}", f"final_s2_{final_match['id']}")
+                version_key = f"ko_version_{final_match['id']}"
+                st.session_state.setdefault(version_key, int(final_match['version']))
+
                 col_a, col_b = st.columns(2)
                 with col_a:
-                    f1 = st.number_input(f"{final_match['team1']} Goals", 0, 20, key=f"final_s1_{final_match['id']}", value=0)
+                    st.number_input(f"{final_match['team1']} Goals", 0, 20, key=f"final_s1_{final_match['id']}")
                 with col_b:
-                    f2 = st.number_input(f"{final_match['team2']} Goals", 0, 20, key=f"final_s2_{final_match['id']}", value=0)
-                
+                    st.number_input(f"{final_match['team2']} Goals", 0, 20, key=f"final_s2_{final_match['id']}")
+
+                save = partial(update_knockout_match_score, final_match['id'])
                 if st.button("Update Final Score", key=f"final_update_{final_match['id']}", type="primary"):
-                    print("Updating final score with values:", f1, f2)
-                    print("Match-ID",final_match['id'])
-                    if update_final_score(final_match['id'], f1, f2):
+                    if save_score(score_keys, version_key, save) == 'updated':
                         st.success("Final score updated!")
-                        st.rerun()
-                    else:
-                        st.error("Failed to update final score!")
+                        st.rerun(scope="fragment")
+                show_score_conflict(score_keys, version_key, save)
     st.markdown('</div>', unsafe_allow_html=True)  # Close bracket-layout
     
     # Champion display
@@ -1525,6 +1466,17 @@ def show_knockout_bracket():
         ''', unsafe_allow_html=True)
 
 # Alternative method using st.image 
+def show_team_logo_image(team_name):
+    logo_path = find_team_logo(team_name)
+    if logo_path is None:
+        st.write("🏆")  # Placeholder
+        return
+    try:
+        st.image(logo_path, width=100)
+    except Exception as e:
+        logger.error(f"Error displaying logo for {team_name}: {e}")
+        st.write("🏆")
+
 def show_knockout_bracket_alt():
     """
     Alternative version using Streamlit's st.image instead of base64 embedding.
@@ -1553,26 +1505,7 @@ def show_knockout_bracket_alt():
         col1, col2, col3 = st.columns([2, 1, 2])
         
         with col1:
-            # Try to display team 1 logo
-            logo_paths = [
-                f"team_logo/{match['team1']}.png",
-                f"team_logo/{match['team1']}.jpg",
-                f"./team_logo/{match['team1']}.png",
-                f"./team_logo/{match['team1']}.jpg"
-            ]
-            
-            logo_displayed = False
-            for path in logo_paths:
-                try:
-                    if os.path.exists(path):
-                        st.image(path, width=100)
-                        logo_displayed = True
-                        break
-                except Exception as e:
-                    logger.error(f"Error displaying image {path}: {e}")
-            
-            if not logo_displayed:
-                st.write("🏆")  # Placeholder
+            show_team_logo_image(match['team1'])
             
             st.write(f"**{match['team1']}**")
             st.write(f"Score: {'-' if not match['completed'] else int(match['score1'])}")
@@ -1581,26 +1514,7 @@ def show_knockout_bracket_alt():
             st.write("**VS**")
         
         with col3:
-            # Try to display team 2 logo
-            logo_paths = [
-                f"team_logo/{match['team2'].lower()}.png",
-                f"team_logo/{match['team2'].lower()}.jpg",
-                f"./team_logo/{match['team2'].lower()}.png",
-                f"./team_logo/{match['team2'].lower()}.jpg"
-            ]
-            
-            logo_displayed = False
-            for path in logo_paths:
-                try:
-                    if os.path.exists(path):
-                        st.image(path, width=100)
-                        logo_displayed = True
-                        break
-                except Exception as e:
-                    logger.error(f"Error displaying image {path}: {e}")
-            
-            if not logo_displayed:
-                st.write("🏆")  # Placeholder
+            show_team_logo_image(match['team2'])
             
             st.write(f"**{match['team2']}**")
             st.write(f"Score: {'-' if not match['completed'] else int(match['score2'])}")
@@ -1631,6 +1545,7 @@ def show_knockout_bracket_alt():
 
 from pathlib import Path
 
+@st.fragment(key="stats")
 def show_stats():
     """Display football tournament stats with mobile-optimized layout"""
     
@@ -1826,308 +1741,287 @@ def show_stats():
     </style>
     """, unsafe_allow_html=True)
     
-    # Connect to database
     try:
-        conn = sqlite3.connect('tournament.db')
-        cursor = conn.cursor()
-        
-        # Fetch team stats
-        cursor.execute("""
-            SELECT name, goals_for, goals_against, points, matches_played 
-            FROM teams 
-            ORDER BY points DESC, goals_for DESC
-        """)
-        teams_data = cursor.fetchall()
-        
-        if not teams_data:
+        stats = get_tournament_stats()
+        if stats['teams'].empty:
             st.warning("⚠️ No team data available yet!")
             return
-        
-        # Find best attacking team (most goals scored)
-        best_attack_team = max(teams_data, key=lambda x: x[1])
-        
-        # Find best defensive team (least goals conceded, but only teams that played matches)
-        defensive_teams = [team for team in teams_data if team[4] > 0]  # matches_played > 0
-        if defensive_teams:
-            best_defense_team = min(defensive_teams, key=lambda x: x[2])
-        else:
-            best_defense_team = teams_data[0] if teams_data else None
-        
-        # Stats Tiles Container
-        #st.markdown('<div class="stats-container">', unsafe_allow_html=True)
-        
-        # Most Goals Scored Tile
-        # st.markdown(f"""
-        # <div class="stat-tile">
-        #     <div class="stat-title">
-        #         🦁 Predators of the Pitch
-        #     </div>
-        #     <div class="stat-team">
-        #         {best_attack_team[0]}
-        #         <span class="stat-value">{best_attack_team[1]}</span>
-        #     </div>
-        #     <div class="stat-description">
-        #         Team with highest Goals For (GF)
-        #     </div>
-        # </div>
-        # """, unsafe_allow_html=True)
-        team_name = best_attack_team[0]
-
-        # Try to find team logo
-        logo_path = None
-        logo_extensions = ['.png', '.jpg', '.jpeg', '.gif']
-        for ext in logo_extensions:
-            potential_path = f"team_logo/{team_name}{ext}"
-            if os.path.exists(potential_path):
-                logo_path = potential_path
-                break
-        
-        # Create tile with logo on the right
-        if logo_path:
-            try:
-                import base64
-                with open(logo_path, "rb") as img_file:
-                    img_data = base64.b64encode(img_file.read()).decode()
-                    img_ext = logo_path.split('.')[-1].lower()
-                    if img_ext == 'jpg':
-                        img_ext = 'jpeg'
-                st.markdown(f"""
-                        <div class="stat-tile" style="display: flex; align-items: center; justify-content: space-between;">
-                            <div style="flex: 1;">
-                                <div class="stat-title">
-                                    🦁 Predators of the Pitch
-                                </div>
-                                <div class="stat-team">
-                                    {best_attack_team[0]}
-                                    <span class="stat-value">{best_attack_team[1]}</span>
-                                </div>
-                                <div class="stat-description">
-                                    Team with Highest Goals Scored (GF: Goals For)
-                                </div>
-                            </div>
-                            <div style="margin-left: 15px;">
-                                <img src="data:image/{img_ext};base64,{img_data}" style="width: 60px; height: 60px; border-radius: 50%; object-fit: cover; border: 3px solid #ffd700;" alt="{team_name}">
-                            </div>
-                        </div>
-                        """, unsafe_allow_html=True)
-        
-            except:
-                st.markdown(f"""
-        <div class="stat-tile">
-            <div class="stat-title">
-                🦁 Predators of the Pitch
-            </div>
-            <div class="stat-team">
-                {best_attack_team[0]}
-                <span class="stat-value">{best_attack_team[1]}</span>
-            </div>
-            <div class="stat-description">
-                Team with highest Goals For (GF)
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        # Strongest Defense Tile
-        if best_defense_team:
-            team_name = best_defense_team[0]
-            
-            # Try to find team logo
-            logo_path = None
-            logo_extensions = ['.png', '.jpg', '.jpeg', '.gif']
-            for ext in logo_extensions:
-                potential_path = f"team_logo/{team_name}{ext}"
-                if os.path.exists(potential_path):
-                    logo_path = potential_path
-                    break
-            
-            # Create tile with logo on the right
-            if logo_path:
-                try:
-                    import base64
-                    with open(logo_path, "rb") as img_file:
-                        img_data = base64.b64encode(img_file.read()).decode()
-                        img_ext = logo_path.split('.')[-1].lower()
-                        if img_ext == 'jpg':
-                            img_ext = 'jpeg'
-                    
-                    st.markdown(f"""
-                    <div class="stat-tile" style="display: flex; align-items: center; justify-content: space-between;">
-                        <div style="flex: 1;">
-                            <div class="stat-title">
-                                🛡️ The Iron Wall
-                            </div>
-                            <div class="stat-team">
-                                {best_defense_team[0]}
-                                <span class="stat-value">{best_defense_team[2]}</span>
-                            </div>
-                            <div class="stat-description">
-                                Team with lowest Goals Against (GA: Goals Against)
-                            </div>
-                        </div>
-                        <div style="margin-left: 15px;">
-                            <img src="data:image/{img_ext};base64,{img_data}" style="width: 60px; height: 60px; border-radius: 50%; object-fit: cover; border: 3px solid #ffd700;" alt="{team_name}">
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                except:
-                    # Fallback without image
-                    st.markdown(f"""
-                    <div class="stat-tile">
-                        <div class="stat-title">
-                            🛡️ The Iron Wall
-                        </div>
-                        <div class="stat-team">
-                            {best_defense_team[0]}
-                            <span class="stat-value">{best_defense_team[2]}</span>
-                        </div>
-                        <div class="stat-description">
-                            Team with lowest Goals Against (GA)
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
-            else:
-                # No logo found
-                st.markdown(f"""
-                <div class="stat-tile">
-                    <div class="stat-title">
-                        🛡️ The Iron Wall
-                    </div>
-                    <div class="stat-team">
-                        {best_defense_team[0]}
-                        <span class="stat-value">{best_defense_team[2]}</span>
-                    </div>
-                    <div class="stat-description">
-                        Team with lowest Goals Against (GA)
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                
-        st.markdown('</div>', unsafe_allow_html=True)  # Close stats-container
-            
-        col1, col2 = st.columns(2)
-        
+
+        best_attack = stats['best_attack']
+        st.markdown(stat_tile_html("🦁 Predators of the Pitch", best_attack['team'], best_attack['goals_for'],
+                                   "Team with Highest Goals Scored (GF: Goals For)"), unsafe_allow_html=True)
+
+        best_defense = stats['best_defense']
+        if best_defense is not None:
+            st.markdown(stat_tile_html("🛡️ The Iron Wall", best_defense['team'], best_defense['goals_against'],
+                                       "Team with lowest Goals Against (GA: Goals Against)"), unsafe_allow_html=True)
+
+        col1, col2, col3 = st.columns(3)
         with col1:
             st.metric(
                 label="🎯 Total Goals Scored",
-                value=sum(team[1] for team in teams_data),
+                value=stats['total_goals'],
                 help="Combined goals by all teams"
             )
-        
         with col2:
             st.metric(
-                label="⚽ Total Matches Played", 
-                value=sum(team[4] for team in teams_data) // 2,  # Divide by 2 since each match counts for 2 teams
+                label="⚽ Total Matches Played",
+                value=stats['matches_played'],
                 help="Total completed matches"
             )
-        
-        conn.close()
-        
+        with col3:
+            st.metric(
+                label="📈 Goals per Match",
+                value=stats['goals_per_match'],
+                help=f"{stats['draws']} match(es) drawn"
+            )
+
+        st.subheader("📋 Team Form")
+        teams = stats['teams']
+        st.dataframe(
+            pd.DataFrame({
+                'Team': teams['team'],
+                'P': teams['played'],
+                'W-D-L': teams['won'].astype(str) + "-" + teams['drawn'].astype(str) + "-" + teams['lost'].astype(str),
+                'GF': teams['goals_for'],
+                'GA': teams['goals_against'],
+                'GD': teams['goal_difference'],
+                'Clean Sheets': teams['clean_sheets'],
+                'Goals/Match': teams['goals_per_match'],
+                'Current Run': teams['form'],
+                'Best Win Run': teams['longest_winning_run'],
+                '🏠 Home W-D-L': teams['home_won'].astype(str) + "-" + teams['home_drawn'].astype(str) + "-" + teams['home_lost'].astype(str),
+                '🚌 Away W-D-L': teams['away_won'].astype(str) + "-" + teams['away_drawn'].astype(str) + "-" + teams['away_lost'].astype(str),
+            }),
+            hide_index=True,
+            width="stretch",
+        )
+
+        biggest = stats['biggest_wins']
+        if not biggest.empty:
+            st.subheader("💥 Biggest Wins")
+            for win in biggest.itertuples():
+                st.markdown(f"**{win.winner}** {win.winner_goals} - {win.loser_goals} {win.loser} "
+                            f"<span style='color: gray;'>({win.match_name})</span>", unsafe_allow_html=True)
+
+        show_table_over_time()
+        show_qualification_chances()
+
     except sqlite3.Error as e:
         st.error(f"Database error: {e}")
     except Exception as e:
         st.error(f"An error occurred: {e}")
+
+def show_table_over_time():
+    """The league table after any completed match, and every team's position over time."""
+    history = get_league_history()
+    if len(history) == 0:
+        return
+
+    st.subheader("⏳ Table Over Time")
+    # Starts at the latest match, and again whenever another one finishes
+    after = st.slider("Table after match", 1, len(history), len(history)) if len(history) > 1 else 1
+    match = history.matches.iloc[after - 1]
+    finished = f", finished {pd.to_datetime(match['end_time']).strftime('%H:%M')}" if pd.notna(match['end_time']) else ""
+    st.caption(f"After {match['match_name']}{finished}")
+    st.markdown(render_league_table(history.table_after(after)), unsafe_allow_html=True)
+
+    positions = get_position_history().reset_index().melt('after_match', var_name='team', value_name='position')
+    st.altair_chart(
+        alt.Chart(positions).mark_line(point=True).encode(
+            x=alt.X('after_match:Q', title="After match", axis=alt.Axis(tickMinStep=1)),
+            # First place at the top
+            y=alt.Y('position:Q', title="Position", scale=alt.Scale(reverse=True, domain=[1, len(history.teams)]),
+                    axis=alt.Axis(tickMinStep=1)),
+            color=alt.Color('team:N', title="Team"),
+            tooltip=['team', 'position', 'after_match'],
+        ),
+        width="stretch",
+    )
+
+def show_qualification_chances():
+    """Each team's chance of each final position and of the knockouts, while league matches are left."""
+    remaining = int((~get_matches()['completed'].astype(bool)).sum())
+    if remaining == 0 or len(get_teams()) <= QUALIFIERS:
+        return
+
+    st.subheader("🎲 Qualification Chances")
+    st.caption(f"From {qualification_simulations(remaining):,} simulations of the {remaining} match(es) left")
+    chances = get_qualification_chances(remaining)
+    positions = [column for column in chances.columns if isinstance(column, int)]
+    st.dataframe(
+        pd.DataFrame({
+            'Team': chances['name'],
+            'Qualify': chances['qualify'] * 100,
+            **{f"#{position}": chances[position] * 100 for position in positions},
+        }),
+        hide_index=True,
+        width="stretch",
+        column_config={
+            'Qualify': st.column_config.ProgressColumn(f"Top {QUALIFIERS}", format="%.1f%%", min_value=0, max_value=100),
+            **{f"#{position}": st.column_config.NumberColumn(format="%.1f%%") for position in positions},
+        },
+    )
+
+def stat_tile_html(title, team_name, value, description):
+    """A Stats tab tile, with the team's logo on the right when it has one."""
+    logo_src = team_logo_src(team_name, 60)
+    logo = f"""
+        <div style="margin-left: 15px;">
+            <img src="{logo_src}" style="width: 60px; height: 60px; border-radius: 50%; object-fit: cover; border: 3px solid #ffd700;" alt="{team_name}">
+        </div>""" if logo_src else ""
+    return f"""
+    <div class="stat-tile" style="display: flex; align-items: center; justify-content: space-between;">
+        <div style="flex: 1;">
+            <div class="stat-title">
+                {title}
+            </div>
+            <div class="stat-team">
+                {team_name}
+                <span class="stat-value">{value}</span>
+            </div>
+            <div class="stat-description">
+                {description}
+            </div>
+        </div>{logo}
+    </div>
+    """
 #############################################################################
 
 
 
 
-# Enhanced import function to handle Excel better
-def import_fixtures_from_excel(uploaded_file):
+# Import any supported fixture file, streaming it in chunks
+def import_fixtures_from_file(uploaded_file, content_hash=None, progress=None):
     try:
-        # Read Excel file
-        df = pd.read_excel(uploaded_file)
-        
-        # Check required columns
-        required_cols = ['Match', 'Team 1', 'Team 2']
-        missing_cols = [col for col in required_cols if col not in df.columns]
-        if missing_cols:
-            return False, f"Missing columns: {', '.join(missing_cols)}"
-        
-        # Clean data
-        df = df.dropna(subset=required_cols)
-        df['Team 1'] = df['Team 1'].str.strip()
-        df['Team 2'] = df['Team 2'].str.strip()
-        df['Match'] = df['Match'].str.strip()
-        
-        # Handle time columns (convert datetime.time objects to strings)
-        def convert_time_to_string(series):
-            converted = []
-            for value in series:
-                if pd.isna(value) or value is None:
-                    converted.append(None)
-                elif hasattr(value, 'strftime'):  # datetime.time object
-                    converted.append(value.strftime('%H:%M:%S'))
-                else:
-                    # Try to parse as string if it's not already a time object
-                    try:
-                        time_obj = pd.to_datetime(str(value), format='%H:%M:%S').time()
-                        converted.append(time_obj.strftime('%H:%M:%S'))
-                    except:
-                        converted.append(None)
-            return converted
-        
-        # Process time columns
-        if 'StartTime' in df.columns:
-            df['StartTime'] = convert_time_to_string(df['StartTime'])
-        else:
-            df['StartTime'] = [None] * len(df)
-            
-        if 'EndTime' in df.columns:
-            df['EndTime'] = convert_time_to_string(df['EndTime'])
+        if hasattr(uploaded_file, 'seek'):
+            uploaded_file.seek(0)
+        chunks = read_fixture_chunks(uploaded_file, progress=progress)
+        return import_fixtures(chunks, content_hash, getattr(uploaded_file, 'name', None))
+    
+    except Exception as e:
+        return False, f"Error importing fixtures: {str(e)}"
+
+# Fixture upload for admin: replace the whole tournament or apply only what changed
+def admin_upload_fixtures():
+    st.sidebar.markdown("---")
+    st.sidebar.subheader("📁 Upload Fixtures")
+    import_mode = st.sidebar.radio("Import mode", ["Replace tournament", "Update changed matches"], key="import_mode")
+    uploaded_file = st.sidebar.file_uploader("Choose fixture file (Excel, CSV or JSON Lines)", type=supported_extensions())
+    if uploaded_file is None:
+        return
+    
+    if import_mode == "Update changed matches":
+        show_fixture_update_preview(uploaded_file)
+        return
+    
+    # The uploader keeps the file attached across reruns; only look at it once
+    if st.session_state.get('file_processed') != uploaded_file.file_id:
+        content_hash = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+        if fixture_file_imported(content_hash):
+            st.session_state.upload_result = (None, "This fixture file has already been imported.")
         else:
-            df['EndTime'] = [None] * len(df)
-        
-        # Clear existing data
-        clear_all_data()
-        
-        conn = sqlite3.connect('tournament.db')
-        cursor = conn.cursor()
-        
-        # Extract unique teams
-        teams = set()
-        for _, row in df.iterrows():
-            teams.add(row['Team 1'])
-            teams.add(row['Team 2'])
+            progress_bar = st.sidebar.progress(0.0, text="Importing fixtures...")
+            def show_progress(rows_read, fraction):
+                progress_bar.progress(fraction or 0.0, text=f"Importing fixtures... {rows_read} rows read")
+            st.session_state.upload_result = import_fixtures_from_file(uploaded_file, content_hash, show_progress)
+            progress_bar.empty()
+        st.session_state.file_processed = uploaded_file.file_id
+    
+    success, message = st.session_state.upload_result
+    if success:
+        st.sidebar.success(message)
+    elif success is None:
+        st.sidebar.info(message)
+    else:
+        st.sidebar.error(message)
+
+def show_fixture_update_preview(uploaded_file):
+    match_key = st.sidebar.selectbox("Match rows by", ["match_name", "match_order"],
+                                     format_func=lambda key: "Match name" if key == "match_name" else "Match order")
+    
+    # Parse the workbook once per upload, not on every rerun
+    if st.session_state.get('update_file_id') != uploaded_file.file_id:
+        st.session_state.update_file_id = uploaded_file.file_id
+        st.session_state.update_file_hash = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+        try:
+            st.session_state.update_df = read_fixtures(uploaded_file)
+        except Exception as e:
+            st.session_state.update_df = None
+            st.session_state.update_plan_error = str(e)
+    df = st.session_state.update_df
+    if df is None:
+        st.sidebar.error(f"Error reading fixtures: {st.session_state.update_plan_error}")
+        return
+    
+    # The diff only changes when the file, the key or the stored matches do
+    plan_key = (uploaded_file.file_id, match_key, get_data_version())
+    if st.session_state.get('update_plan_key') != plan_key:
+        try:
+            st.session_state.update_plan = plan_fixture_update(df, match_key)
+        except Exception as e:
+            st.session_state.update_plan = None
+            st.session_state.update_plan_error = str(e)
+        st.session_state.update_plan_key = plan_key
+    plan = st.session_state.update_plan
+    if plan is None:
+        st.sidebar.error(f"Error reading fixtures: {st.session_state.update_plan_error}")
+        return
+    
+    inserts, updates, deletes = plan['inserts'], plan['updates'], plan['deletes']
+    if inserts.empty and updates.empty and deletes.empty:
+        st.sidebar.info("No changes - the fixtures already match this file.")
+        return
+    
+    st.sidebar.write(f"**Dry run:** ➕ {len(inserts)} new · ✏️ {len(updates)} changed · 🗑️ {len(deletes)} removed")
+    with st.sidebar.expander("🔍 Preview changes", expanded=True):
+        if not updates.empty:
+            st.write("**Changed**")
+            st.dataframe(updates[['match_name', 'changes']], hide_index=True)
+        if not inserts.empty:
+            st.write("**New**")
+            st.dataframe(inserts[['match_name', 'team1', 'team2', 'start_time']], hide_index=True)
+        if not deletes.empty:
+            st.write("**Removed**")
+            st.dataframe(deletes[['match_name', 'team1', 'team2', 'completed']], hide_index=True)
+    
+    if st.sidebar.button("✅ Apply Changes", type="primary"):
+        try:
+            apply_fixture_update(df, match_key, st.session_state.update_file_hash, uploaded_file.name)
+            st.sidebar.success("Fixtures updated!")
+            st.rerun()
+        except Exception as e:
+            st.sidebar.error(f"Error updating fixtures: {str(e)}")
+
+# Recompute the league table from the score ledger
+def admin_rebuild_standings():
+    if st.session_state.admin_logged_in:
+        st.sidebar.markdown("---")
+        st.sidebar.subheader("🧮 Standings")
         
-        # Insert teams
-        for team in teams:
-            cursor.execute("INSERT OR IGNORE INTO teams (name) VALUES (?)", (team,))
+        if st.sidebar.button("♻️ Rebuild Standings", type="secondary"):
+            run_write(rebuild_standings)
+            st.sidebar.success("Standings rebuilt from match history!")
+
+# Rename a team; matches refer to it by ID, so only its own row changes
+def admin_rename_team():
+    if st.session_state.admin_logged_in:
+        teams_df = get_teams()
+        if teams_df.empty:
+            return
+        st.sidebar.markdown("---")
+        st.sidebar.subheader("✏️ Rename Team")
         
-        # Insert matches
-        for i, row in df.iterrows():
-            # Handle pre-filled scores if they exist
-            score1 = row.get('Score1', None)
-            score2 = row.get('Score2', None)
-            completed = False
-            
-            if pd.notna(score1) and pd.notna(score2):
-                score1 = int(score1)
-                score2 = int(score2)
-                completed = True
+        team_names = dict(zip(teams_df['id'], teams_df['name']))
+        team_id = st.sidebar.selectbox("Team", list(team_names), format_func=team_names.get, key="rename_team_id")
+        new_name = st.sidebar.text_input("New name", key="rename_team_name")
+        if st.sidebar.button("✏️ Rename", type="secondary") and new_name.strip():
+            try:
+                run_write(rename_team, int(team_id), new_name)
+            except ValueError as e:
+                st.sidebar.error(str(e))
             else:
-                score1 = score2 = None
-            
-            # Get the time values
-            start_time = row['StartTime']
-            end_time = row['EndTime']
-            
-            cursor.execute('''
-                INSERT INTO matches (match_name, team1, team2, score1, score2, completed, match_order, start_time, end_time)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (row['Match'], row['Team 1'], row['Team 2'], score1, score2, completed, i + 1, start_time, end_time))
-            
-            # Update team stats if scores exist
-            if completed:
-                update_team_stats(cursor, row['Team 1'], score1, score2, get_points(score1, score2), 1)
-                update_team_stats(cursor, row['Team 2'], score2, score1, get_points(score2, score1), 1)
-        
-        conn.commit()
-        conn.close()
-        return True, f"Successfully imported {len(df)} matches with {len(teams)} teams!"
-    
-    except Exception as e:
-        return False, f"Error importing fixtures: {str(e)}"
+                st.sidebar.success(f"Renamed {team_names[team_id]} to {' '.join(new_name.split())}!")
 
 # Add clear data function for admin
 
@@ -0,0 +1,188 @@
+"""League standings ordered by a configurable list of tiebreakers.
+
+The ranking is worked out when results are written, not when the table is
+read: write_positions stores each team's place in ``teams.position``, which
+the standings read is ordered and indexed by.
+
+Teams are split by each rule in turn, and a rule only looks at teams the
+rules before it left level. The head-to-head rules therefore run a mini
+league among exactly the teams still tied, read from the N x N results
+matrix that the ledger keeps in ``head_to_head``; a multi-way tie costs a
+sum over a k x k block of it, never a pass over the matches.
+
+Rules, best first:
+
+- ``points``, ``goal_difference``, ``goals_for``: the league totals
+- ``head_to_head_points``, ``head_to_head_goal_difference``,
+  ``head_to_head_goals_for``: the same among the tied teams only
+- ``fair_play``: fewest disciplinary points (``teams.fair_play_points``)
+- ``lots``: a drawing of lots by team ID, seeded so every page and the API
+  agree and a rename does not redraw them
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+
+# The order ties are broken in
+TIEBREAKERS = [
+    'points',
+    'goal_difference',
+    'goals_for',
+    'head_to_head_points',
+    'head_to_head_goal_difference',
+    'fair_play',
+    'lots',
+]
+# Changing the seed redraws the lots
+LOTS_SEED = 'IGNITE 2025'
+
+# The rules that look at who else is level, not just at each team
+GROUP_RULES = {'head_to_head_points', 'head_to_head_goal_difference', 'head_to_head_goals_for'}
+
+
+class HeadToHead:
+    """The head-to-head results as N x N matrices, in the order of ``teams`` (IDs).
+
+    Row ``i``, column ``j`` holds what team ``i`` got against team ``j``.
+    """
+
+    def __init__(self, teams, rows):
+        index = pd.Index(teams)
+        n = len(index)
+        self.points = np.zeros((n, n), dtype=np.int64)
+        self.goals_for = np.zeros((n, n), dtype=np.int64)
+        self.goals_against = np.zeros((n, n), dtype=np.int64)
+        if not rows:
+            return
+
+        team, opponent, points, goals_for, goals_against = zip(*rows)
+        i, j = index.get_indexer(team), index.get_indexer(opponent)
+        # Pairs naming a team not in ``teams`` come back as -1
+        known = (i >= 0) & (j >= 0)
+        i, j = i[known], j[known]
+        self.points[i, j] = np.asarray(points, dtype=np.int64)[known]
+        self.goals_for[i, j] = np.asarray(goals_for, dtype=np.int64)[known]
+        self.goals_against[i, j] = np.asarray(goals_against, dtype=np.int64)[known]
+
+    def add(self, i, j, goals_i, goals_j):
+        """Count results between teams ``i`` and ``j`` (indices, or arrays of them)."""
+        goals_i, goals_j = np.asarray(goals_i), np.asarray(goals_j)
+        points_i = np.select([goals_i > goals_j, goals_i == goals_j], [3, 1], 0)
+        points_j = np.select([goals_j > goals_i, goals_i == goals_j], [3, 1], 0)
+        for team, opponent, scored, conceded, points in [(i, j, goals_i, goals_j, points_i),
+                                                         (j, i, goals_j, goals_i, points_j)]:
+            np.add.at(self.points, (team, opponent), points)
+            np.add.at(self.goals_for, (team, opponent), scored)
+            np.add.at(self.goals_against, (team, opponent), conceded)
+
+    def among(self, matrix, group):
+        """Each team's total of ``matrix`` against the rest of ``group`` only."""
+        return matrix[np.ix_(group, group)].sum(axis=1)
+
+
+class LeagueTable:
+    """The columns the rules read, as arrays in one order of the teams."""
+
+    def __init__(self, ids, points, goals_for, goals_against, fair_play_points, h2h):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.points = np.asarray(points, dtype=np.int64)
+        self.goals_for = np.asarray(goals_for, dtype=np.int64)
+        self.goals_against = np.asarray(goals_against, dtype=np.int64)
+        self.fair_play_points = np.asarray(fair_play_points, dtype=np.int64)
+        self.h2h = h2h
+
+
+def load_head_to_head(conn):
+    """``(team id, opponent id, points, goals_for, goals_against)`` for every pair that has met."""
+    return conn.execute("SELECT team_id, opponent_id, points, goals_for, goals_against FROM head_to_head").fetchall()
+
+
+def write_positions(conn, rules=None):
+    """Rank the teams by ``rules`` (TIEBREAKERS by default) and store their positions.
+
+    Runs inside the caller's write transaction, after the standings and
+    head-to-head results it ranks by are up to date.
+    """
+    teams = pd.read_sql_query("SELECT * FROM teams ORDER BY name", conn)
+    ranked = rank_teams(teams, load_head_to_head(conn), rules)
+    conn.executemany(
+        "UPDATE teams SET position = ? WHERE id = ?",
+        [(position, int(team_id)) for position, team_id in enumerate(ranked['id'], start=1)],
+    )
+
+
+def rank_teams(teams, head_to_head_rows, rules=None):
+    """Return ``teams`` reordered by the tiebreak rules, best first."""
+    teams = teams.reset_index(drop=True)
+    table = LeagueTable(
+        teams['id'], teams['points'], teams['goals_for'], teams['goals_against'],
+        # Databases the app has not migrated yet have no such column
+        teams['fair_play_points'].fillna(0) if 'fair_play_points' in teams else np.zeros(len(teams)),
+        HeadToHead(teams['id'], head_to_head_rows),
+    )
+    return teams.iloc[rank_order(table, rules)].reset_index(drop=True)
+
+
+def rule_runs(rules=None):
+    """``rules`` (TIEBREAKERS by default) as the runs they are applied in.
+
+    Rules that only look at each team's own figures give the same values
+    whichever teams are level, so consecutive ones are applied in one sort;
+    each head-to-head rule is a run of its own.
+    """
+    rules = TIEBREAKERS if rules is None else rules
+    unknown = [rule for rule in rules if rule not in RULES]
+    if unknown:
+        raise ValueError(f"Unknown tiebreak rule(s): {', '.join(unknown)}")
+
+    runs = []
+    for rule in rules:
+        if runs and rule not in GROUP_RULES and runs[-1][-1] not in GROUP_RULES:
+            runs[-1].append(rule)
+        else:
+            runs.append([rule])
+    return runs
+
+
+def rank_order(table, rules=None):
+    """Indices of the teams in a LeagueTable, best first."""
+    groups = [np.arange(len(table.ids))]
+    for run in rule_runs(rules):
+        if all(len(group) == 1 for group in groups):
+            break
+        groups = [part for group in groups
+                  for part in (_split([RULES[rule] for rule in run], table, group) if len(group) > 1 else [group])]
+    return np.concatenate(groups)
+
+
+def _split(rules, table, group):
+    # The group's teams in order of the rules, as runs of teams still level
+    values = np.stack([rule(table, group) for rule in rules])
+    # lexsort sorts by its last key first
+    order = np.lexsort(-values[::-1])
+    group, values = group[order], values[:, order]
+    bounds = [0, *(np.flatnonzero((values[:, 1:] != values[:, :-1]).any(axis=0)) + 1).tolist(), len(group)]
+    return [group[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def _lots(table, group):
+    return np.array([
+        int.from_bytes(hashlib.sha256(f"{LOTS_SEED}:{team_id}".encode()).digest()[:8], 'big') >> 1
+        for team_id in table.ids[group]
+    ], dtype=np.int64)
+
+
+# rule -> function(table, indices of the tied teams) giving higher-is-better values
+RULES = {
+    'points': lambda t, group: t.points[group],
+    'goal_difference': lambda t, group: t.goals_for[group] - t.goals_against[group],
+    'goals_for': lambda t, group: t.goals_for[group],
+    'head_to_head_points': lambda t, group: t.h2h.among(t.h2h.points, group),
+    'head_to_head_goal_difference': lambda t, group: (
+        t.h2h.among(t.h2h.goals_for, group) - t.h2h.among(t.h2h.goals_against, group)),
+    'head_to_head_goals_for': lambda t, group: t.h2h.among(t.h2h.goals_for, group),
+    'fair_play': lambda t, group: -t.fair_play_points[group],
+    'lots': _lots,
+}
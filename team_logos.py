@@ -0,0 +1,70 @@
+"""Index of the team logos in ``team_logo/``.
+
+The folder is scanned once and rescanned only when its mtime changes (a
+logo added, removed or renamed), so looking a team up is a dictionary hit.
+Names are normalised on both sides: case, extra spaces and a bracketed
+suffix such as a venue are ignored, so "The Gregorians [Chinchwad]" finds
+``The Gregorians.jpg``.
+"""
+import os
+import re
+import threading
+
+from asset_cache import image_src
+
+LOGO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'team_logo')
+# When a team has several files the earlier extension wins
+LOGO_EXTENSIONS = ['.png', '.jpg', '.jpeg', '.gif', '.webp']
+
+_BRACKETED = re.compile(r'\s*[\[(][^\])]*[\])]\s*')
+
+_lock = threading.Lock()
+_index = {}
+_index_mtime = None
+
+
+def normalize_team_name(name):
+    name = _BRACKETED.sub(' ', str(name))
+    return ' '.join(name.split()).casefold()
+
+
+def find_team_logo(team_name):
+    """Path of the team's logo file, or None if it has none."""
+    return logo_index().get(normalize_team_name(team_name))
+
+
+def team_logo_src(team_name, size):
+    """``<img src>`` for the team's logo shown in a ``size`` px square slot, or None."""
+    path = find_team_logo(team_name)
+    if path is None:
+        return None
+    return image_src(path, size, size, cover=True)
+
+
+def logo_index():
+    """The normalised team name -> logo path mapping, rescanned if the folder changed."""
+    global _index, _index_mtime
+    try:
+        mtime = os.stat(LOGO_DIR).st_mtime_ns
+    except OSError:
+        mtime = None
+
+    with _lock:
+        if mtime != _index_mtime:
+            _index = _scan() if mtime is not None else {}
+            _index_mtime = mtime
+        return _index
+
+
+def _scan():
+    logos = []
+    with os.scandir(LOGO_DIR) as entries:
+        for entry in entries:
+            stem, ext = os.path.splitext(entry.name)
+            if entry.is_file() and ext.lower() in LOGO_EXTENSIONS:
+                logos.append((LOGO_EXTENSIONS.index(ext.lower()), stem, entry.path))
+
+    index = {}
+    for _, stem, path in sorted(logos):
+        index.setdefault(normalize_team_name(stem), path)
+    return index
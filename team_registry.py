@@ -0,0 +1,113 @@
+"""Registry of teams by integer ID, and the names that lead to them.
+
+Matches, knockout matches, the ledger and the head-to-head results refer to
+teams by ``teams.id``; a team's display name is stored once, on its row, and
+joined in by the reads. Names from fixture files are resolved to IDs once,
+when they are written, through ``team_aliases``: every spelling a team has
+been entered under (compared without case or extra spaces) points at it.
+
+Renaming a team updates its one row and keeps the old name as an alias, so
+a later upload still using it finds the same team.
+
+Every team row has a league position: a new team starts below the rest and
+deleting teams closes the gap, until the write adding or removing them ranks
+the table again (standings.write_positions).
+"""
+from tournament_db import add_missing_column, has_column
+
+# Stands in for a team not yet known, such as a finalist before the semis
+TBD = 'TBD'
+
+
+def create_team_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS team_aliases (
+            alias TEXT PRIMARY KEY,
+            team_id INTEGER NOT NULL REFERENCES teams (id)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_team_aliases_team ON team_aliases (team_id)")
+
+
+def alias_key(name):
+    """The form names are compared in: case and extra spaces ignored."""
+    return ' '.join(str(name).split()).casefold()
+
+
+def resolve_team_ids(conn, names):
+    """Return ``{name: team id}`` for ``names``, registering teams not seen before."""
+    known = dict(conn.execute("SELECT alias, team_id FROM team_aliases"))
+    ids = {}
+    for name in names:
+        key = alias_key(name)
+        if key not in known:
+            # A team already in the teams table under exactly this name keeps its row
+            conn.execute('''
+                INSERT INTO teams (name, position) VALUES (?, (SELECT COALESCE(MAX(position), 0) + 1 FROM teams))
+                ON CONFLICT (name) DO NOTHING
+            ''', (name,))
+            team_id = conn.execute("SELECT id FROM teams WHERE name = ?", (name,)).fetchone()[0]
+            conn.execute("INSERT INTO team_aliases (alias, team_id) VALUES (?, ?)", (key, team_id))
+            known[key] = team_id
+        ids[name] = known[key]
+    return ids
+
+
+def registered_names(conn):
+    """Return ``{alias: display name}`` for every name a team is known by."""
+    return dict(conn.execute('''
+        SELECT team_aliases.alias, teams.name
+        FROM team_aliases JOIN teams ON teams.id = team_aliases.team_id
+    '''))
+
+
+def rename_team(conn, team_id, name):
+    """Give a team a new display name; every name it had stays an alias of it."""
+    name = ' '.join(str(name).split())
+    if not name:
+        raise ValueError("A team needs a name")
+    owner = conn.execute("SELECT team_id FROM team_aliases WHERE alias = ?", (alias_key(name),)).fetchone()
+    if owner is not None and owner[0] != team_id:
+        raise ValueError(f"{name!r} is already the name of another team")
+
+    cursor = conn.execute("UPDATE teams SET name = ? WHERE id = ?", (name, team_id))
+    if cursor.rowcount == 0:
+        raise ValueError(f"No team with id {team_id}")
+    conn.execute("INSERT OR IGNORE INTO team_aliases (alias, team_id) VALUES (?, ?)", (alias_key(name), team_id))
+
+
+def delete_unused_teams(conn):
+    """Drop the teams no match refers to any more, with their aliases."""
+    conn.execute('''
+        DELETE FROM teams WHERE id NOT IN (
+            SELECT team1_id FROM matches WHERE team1_id IS NOT NULL
+            UNION SELECT team2_id FROM matches WHERE team2_id IS NOT NULL
+        )
+    ''')
+    conn.execute("DELETE FROM team_aliases WHERE team_id NOT IN (SELECT id FROM teams)")
+    # The teams left keep their order with no gaps
+    ranked = conn.execute("SELECT id FROM teams WHERE position IS NOT NULL ORDER BY position").fetchall()
+    conn.executemany("UPDATE teams SET position = ? WHERE id = ?",
+                     [(position, team_id) for position, (team_id,) in enumerate(ranked, start=1)])
+
+
+def replace_team_names(cursor, table):
+    """Move a table from before team IDs from ``team1``/``team2`` names to IDs.
+
+    Every name is registered, the ``team1_id``/``team2_id`` columns are filled
+    in and the name columns dropped. ``TBD`` becomes NULL.
+    """
+    if not has_column(cursor, table, 'team1'):
+        return
+
+    add_missing_column(cursor, table, 'team1_id', 'INTEGER REFERENCES teams (id)')
+    add_missing_column(cursor, table, 'team2_id', 'INTEGER REFERENCES teams (id)')
+    names = [row[0] for row in cursor.execute(f'''
+        SELECT team1 FROM {table} WHERE team1 IS NOT NULL AND team1 != '{TBD}'
+        UNION SELECT team2 FROM {table} WHERE team2 IS NOT NULL AND team2 != '{TBD}'
+    ''')]
+    ids = resolve_team_ids(cursor.connection, names)
+    for side in ('team1', 'team2'):
+        cursor.executemany(f"UPDATE {table} SET {side}_id = ? WHERE {side} = ?",
+                           [(team_id, name) for name, team_id in ids.items()])
+        cursor.execute(f"ALTER TABLE {table} DROP COLUMN {side}")
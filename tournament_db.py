@@ -0,0 +1,320 @@
+"""Shared SQLite connection layer for the tournament database.
+
+Streamlit re-executes the script on every interaction, but imported modules
+stay loaded for the life of the server process, so the connections kept here
+are shared by every session instead of being opened per query.
+
+Reads use a pool of read-only connections. Every write - score updates,
+imports, resets - is queued to a single writer thread that owns the only
+write connection and commits whatever is waiting as one batched
+transaction, so concurrent scorers never race each other or hit
+``database is locked``.
+
+The queries for the standings, fixtures and knockout matches live here too,
+so the Streamlit app and the JSON API (api_server.py) read the same data the
+same way. Each is served by an index in its read order (unindexed_reads).
+"""
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import pandas as pd
+
+DB_PATH = 'tournament.db'
+BUSY_TIMEOUT_MS = 5000
+READ_POOL_SIZE = 8
+
+# Writes waiting for the writer thread; submitters block when it is full
+WRITE_QUEUE_SIZE = 256
+# Most jobs committed together in one transaction
+MAX_WRITE_BATCH = 32
+
+# The reads behind every page view and API request. Each must be answered
+# from an index in its own order, never by sorting the table (see
+# unindexed_reads); the standings read only columns its index covers.
+STANDINGS_QUERY = '''
+    SELECT id, name, matches_played, goals_for, goals_against, goal_difference, points, fair_play_points, position
+    FROM teams ORDER BY position
+'''
+# Matches refer to teams by ID; their names are joined in by primary key.
+# A knockout slot without a team yet reads as TBD.
+FIXTURES_QUERY = '''
+    SELECT m.id, m.match_name, m.team1_id, m.team2_id, t1.name AS team1, t2.name AS team2,
+           m.score1, m.score2, m.completed, m.match_order, m.start_time, m.end_time, m.version
+    FROM matches m
+    JOIN teams t1 ON t1.id = m.team1_id
+    JOIN teams t2 ON t2.id = m.team2_id
+    ORDER BY m.match_order
+'''
+KNOCKOUT_QUERY = '''
+    SELECT k.id, k.match_name, k.team1_id, k.team2_id,
+           COALESCE(t1.name, 'TBD') AS team1, COALESCE(t2.name, 'TBD') AS team2,
+           k.score1, k.score2, k.completed, k.stage, k.version
+    FROM knockout_matches k
+    LEFT JOIN teams t1 ON t1.id = k.team1_id
+    LEFT JOIN teams t2 ON t2.id = k.team2_id
+    ORDER BY k.stage
+'''
+# Completed matches in the order they finished, for league_history.py.
+# end_time is an ISO 8601 timestamp; untimed results sort first.
+HISTORY_QUERY = '''
+    SELECT id, match_name, team1_id, team2_id, score1, score2, end_time
+    FROM matches WHERE completed
+    ORDER BY end_time, match_order
+'''
+DATA_VERSION_QUERY = "SELECT value FROM tournament_meta WHERE key = 'data_version'"
+HOT_READS = {
+    'standings': STANDINGS_QUERY,
+    'fixtures': FIXTURES_QUERY,
+    'knockout': KNOCKOUT_QUERY,
+    'history': HISTORY_QUERY,
+    'data_version': DATA_VERSION_QUERY,
+}
+
+# Streamlit runs every script execution on a fresh thread, so plain
+# thread-locals would be thrown away after each rerun. Read connections are
+# pooled instead and handed to one thread at a time.
+_read_pool = queue.LifoQueue(maxsize=READ_POOL_SIZE)
+
+_write_queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+_writer_thread = None
+_writer_conn = None
+_writer_start_lock = threading.Lock()
+# Work deferred to the end of the current batch, run once however many jobs asked
+_batch_end = {}
+
+
+def _connect():
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+        isolation_level=None,  # transactions are managed explicitly
+    )
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    return conn
+
+
+def _open_writer():
+    conn = _connect()
+    # WAL lets readers keep going while a score update is being written.
+    # The journal mode is stored in the database file itself.
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tournament_meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO tournament_meta (key, value) VALUES ('data_version', 0)")
+    return conn
+
+
+@contextmanager
+def read_connection():
+    """Borrow a read-only connection from the pool."""
+    try:
+        conn = _read_pool.get_nowait()
+    except queue.Empty:
+        conn = _connect()
+        conn.execute("PRAGMA query_only = ON")
+    try:
+        yield conn
+    finally:
+        try:
+            _read_pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+@contextmanager
+def read_snapshot():
+    """Borrow a read connection whose reads all see the same committed state."""
+    with read_connection() as conn:
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
+
+
+def get_data_version():
+    """Return the counter bumped by every committed write transaction.
+
+    Anything derived from the database can be cached against this value.
+    """
+    with read_connection() as conn:
+        return read_data_version(conn)
+
+
+def submit_write(fn, *args, **kwargs):
+    """Queue ``fn(conn, *args, **kwargs)`` for the writer thread.
+
+    ``fn`` runs inside a write transaction (it must not BEGIN or COMMIT
+    itself) and the returned Future resolves to its return value once the
+    batch it ran in has been committed. If ``fn`` raises, only its own
+    changes are rolled back and the Future carries the exception.
+    """
+    future = Future()
+    if threading.current_thread() is _writer_thread:
+        # Already on the writer, inside the caller's transaction
+        future.set_result(fn(_writer_conn, *args, **kwargs))
+        return future
+
+    _ensure_writer()
+    try:
+        _write_queue.put((fn, args, kwargs, future), timeout=BUSY_TIMEOUT_MS / 1000)
+    except queue.Full:
+        raise sqlite3.OperationalError("write queue is full") from None
+    return future
+
+
+def run_write(fn, *args, **kwargs):
+    """Run ``fn(conn, *args, **kwargs)`` on the writer and wait for the commit."""
+    return submit_write(fn, *args, **kwargs).result()
+
+
+def at_batch_end(fn):
+    """From inside a write job, run ``fn(conn)`` once before the batch commits.
+
+    Lets jobs that each invalidate the same derived data (the standings, say)
+    share one recomputation instead of repeating it per job.
+    """
+    _batch_end[fn] = None
+
+
+def _ensure_writer():
+    global _writer_thread
+    with _writer_start_lock:
+        if _writer_thread is None or not _writer_thread.is_alive():
+            _writer_thread = threading.Thread(target=_writer_loop, name="tournament-db-writer", daemon=True)
+            _writer_thread.start()
+
+
+def _writer_loop():
+    global _writer_conn
+    _writer_conn = _open_writer()
+    while True:
+        batch = [_write_queue.get()]
+        # Coalesce whatever else is already waiting into the same transaction
+        while len(batch) < MAX_WRITE_BATCH:
+            try:
+                batch.append(_write_queue.get_nowait())
+            except queue.Empty:
+                break
+        _run_batch(_writer_conn, batch)
+
+
+def _run_batch(conn, batch):
+    outcomes = []
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        for fn, args, kwargs, future in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            conn.execute("SAVEPOINT write_job")
+            try:
+                result = fn(conn, *args, **kwargs)
+            except Exception as e:
+                if not conn.in_transaction:
+                    # SQLite already abandoned the whole transaction
+                    raise
+                conn.execute("ROLLBACK TO write_job")
+                conn.execute("RELEASE write_job")
+                outcomes.append((future, None, e))
+            else:
+                conn.execute("RELEASE write_job")
+                outcomes.append((future, result, None))
+        for fn in list(_batch_end):
+            fn(conn)
+        conn.execute("UPDATE tournament_meta SET value = value + 1 WHERE key = 'data_version'")
+        conn.execute("COMMIT")
+    except Exception as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        _batch_end.clear()
+        # Nothing in this batch was committed
+        for _, _, _, future in batch:
+            if not future.done():
+                if not future.running():
+                    future.set_running_or_notify_cancel()
+                future.set_exception(e)
+        return
+
+    _batch_end.clear()
+    for future, result, error in outcomes:
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+
+def read_data_version(conn):
+    try:
+        row = conn.execute(DATA_VERSION_QUERY).fetchone()
+    except sqlite3.OperationalError:
+        # Nothing has been written yet
+        return 0
+    return row[0] if row else 0
+
+
+def load_teams(conn):
+    """The league table in the order standings.py last ranked it."""
+    return pd.read_sql_query(STANDINGS_QUERY, conn)
+
+
+def load_matches(conn):
+    return pd.read_sql_query(FIXTURES_QUERY, conn)
+
+
+def load_knockout_matches(conn):
+    return pd.read_sql_query(KNOCKOUT_QUERY, conn)
+
+
+def load_match_history(conn):
+    return pd.read_sql_query(HISTORY_QUERY, conn)
+
+
+def unindexed_reads(conn):
+    """Return ``{name: query plan}`` for the HOT_READS that would scan and sort.
+
+    A read fails when SQLite would sort it in a temporary B-tree or scan a
+    table without an index.
+    """
+    slow = {}
+    for name, query in HOT_READS.items():
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}")]
+        if any('TEMP B-TREE' in step or (step.startswith('SCAN') and 'INDEX' not in step) for step in plan):
+            slow[name] = plan
+    return slow
+
+
+def has_column(cursor, table, column):
+    """Whether ``table`` exists and has ``column``."""
+    # table_xinfo also lists generated columns
+    return column in [row[1] for row in cursor.execute(f"PRAGMA table_xinfo({table})")]
+
+
+def add_missing_column(cursor, table, column, definition):
+    """Add a column to a table created before the column existed."""
+    if not has_column(cursor, table, column):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def clear_tables(cursor, keep=()):
+    """Delete every row of every table but ``keep``, inside the caller's transaction."""
+    # Get all table names
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+    table_names = [row[0] for row in cursor.fetchall()]
+
+    # Truncate all tables (foreign keys are not enforced on these connections)
+    for table in table_names:
+        if table == 'tournament_meta':
+            # Keeps the data version counting up so cached reads are invalidated
+            continue
+        if table in keep:
+            continue
+        cursor.execute(f"DELETE FROM {table};")
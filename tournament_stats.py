@@ -0,0 +1,135 @@
+"""Tournament statistics for the Stats tab, computed from the matches table.
+
+Every completed league match becomes two rows, one per side, and every
+per-team figure is a group-by aggregate over those rows, so the whole page
+comes out of one vectorised pass whatever the number of teams.
+"""
+import numpy as np
+import pandas as pd
+
+# How many matches the biggest-wins list shows
+BIGGEST_WINS = 5
+
+_COUNTS = ['played', 'won', 'drawn', 'lost', 'goals_for', 'goals_against', 'clean_sheets',
+           'home_won', 'home_drawn', 'home_lost', 'away_won', 'away_drawn', 'away_lost']
+
+
+def team_results(matches):
+    """One row per team per completed match, each team's rows in match order."""
+    played = matches[matches['completed'].astype(bool)].dropna(subset=['score1', 'score2'])
+    played = played.sort_values(['match_order', 'id'], kind='stable')
+    score1 = played['score1'].astype(int).to_numpy()
+    score2 = played['score2'].astype(int).to_numpy()
+
+    rows = pd.DataFrame({
+        'match_id': np.tile(played['id'].to_numpy(), 2),
+        'match_name': np.tile(played['match_name'].to_numpy(), 2),
+        'sequence': np.tile(np.arange(len(played)), 2),
+        'team': np.concatenate([played['team1'].to_numpy(), played['team2'].to_numpy()]),
+        'opponent': np.concatenate([played['team2'].to_numpy(), played['team1'].to_numpy()]),
+        'home': np.repeat([True, False], len(played)),
+        'goals_for': np.concatenate([score1, score2]),
+        'goals_against': np.concatenate([score2, score1]),
+    })
+    rows['result'] = np.select(
+        [rows['goals_for'] > rows['goals_against'], rows['goals_for'] == rows['goals_against']],
+        ['W', 'D'],
+        'L',
+    )
+    return rows.sort_values(['team', 'sequence'], kind='stable', ignore_index=True)
+
+
+def team_stats(rows, teams):
+    """Per-team totals, splits and streaks, in the order of ``teams``.
+
+    ``teams`` lists every team, so sides that have not played yet still get
+    a row of zeros.
+    """
+    won, drawn, lost = (rows['result'] == 'W'), (rows['result'] == 'D'), (rows['result'] == 'L')
+    home = rows['home']
+    flags = pd.DataFrame({
+        'team': rows['team'],
+        'played': 1,
+        'won': won,
+        'drawn': drawn,
+        'lost': lost,
+        'goals_for': rows['goals_for'],
+        'goals_against': rows['goals_against'],
+        'clean_sheets': rows['goals_against'] == 0,
+        'home_won': won & home,
+        'home_drawn': drawn & home,
+        'home_lost': lost & home,
+        'away_won': won & ~home,
+        'away_drawn': drawn & ~home,
+        'away_lost': lost & ~home,
+    })
+    stats = flags.groupby('team')[_COUNTS].sum().astype(int).reindex(teams, fill_value=0)
+    stats.index.name = 'team'
+
+    stats['points'] = 3 * stats['won'] + stats['drawn']
+    stats['goal_difference'] = stats['goals_for'] - stats['goals_against']
+    stats['goals_per_match'] = (stats['goals_for'] / stats['played'].where(stats['played'] > 0)).fillna(0).round(2)
+    stats = stats.join(_streaks(rows))
+    stats['form'] = stats['form'].fillna('')
+    stats['longest_winning_run'] = stats['longest_winning_run'].fillna(0).astype(int)
+    return stats.reset_index()
+
+
+def _streaks(rows):
+    """The current run (``"W3"``) and the longest winning run of every team."""
+    if rows.empty:
+        return pd.DataFrame(columns=['form', 'longest_winning_run'])
+    # A new run starts wherever the team or its result changes
+    new_run = (rows['team'] != rows['team'].shift()) | (rows['result'] != rows['result'].shift())
+    runs = rows.assign(run=new_run.cumsum()).groupby('run').agg(
+        team=('team', 'first'), result=('result', 'first'), length=('result', 'size'))
+
+    last_run = runs.groupby('team').tail(1).set_index('team')
+    longest_win = runs[runs['result'] == 'W'].groupby('team')['length'].max()
+    return pd.DataFrame({
+        'form': last_run['result'] + last_run['length'].astype(str),
+        'longest_winning_run': longest_win,
+    })
+
+
+def biggest_wins(rows, count=BIGGEST_WINS):
+    """The decided matches with the widest winning margin, then most goals."""
+    wins = rows[rows['result'] == 'W']
+    wins = pd.DataFrame({
+        'match_name': wins['match_name'],
+        'winner': wins['team'],
+        'loser': wins['opponent'],
+        'winner_goals': wins['goals_for'],
+        'loser_goals': wins['goals_against'],
+        'margin': wins['goals_for'] - wins['goals_against'],
+        'total': wins['goals_for'] + wins['goals_against'],
+        'sequence': wins['sequence'],
+    })
+    wins = wins.sort_values(['margin', 'total', 'sequence'], ascending=[False, False, True], kind='stable')
+    return wins.head(count).drop(columns=['total', 'sequence']).reset_index(drop=True)
+
+
+def compute_tournament_stats(matches, standings_order=()):
+    """Everything the Stats tab shows, as a dict.
+
+    Teams are listed in ``standings_order`` (the league table's order), then
+    any others in fixture order.
+    """
+    teams = pd.unique(pd.concat([pd.Series(standings_order, dtype=object), matches['team1'], matches['team2']]).dropna())
+    rows = team_results(matches)
+    table = team_stats(rows, teams)
+
+    played = table[table['played'] > 0]
+    match_count = len(rows) // 2
+    total_goals = int(rows['goals_for'].sum())
+    return {
+        'teams': table,
+        'biggest_wins': biggest_wins(rows),
+        'total_goals': total_goals,
+        'matches_played': match_count,
+        'goals_per_match': round(total_goals / match_count, 2) if match_count else 0,
+        'draws': int((rows['result'] == 'D').sum()) // 2,
+        # Earlier in the table wins a tie, as it always has on this page
+        'best_attack': table.loc[table['goals_for'].idxmax()] if not table.empty else None,
+        'best_defense': played.loc[played['goals_against'].idxmin()] if not played.empty else None,
+    }